@@ -0,0 +1,54 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from omgtools import *
+
+# build-time benchmark: formation of 5 holonomic vehicles among 10 obstacles
+
+# create fleet
+N = 5
+vehicles = [Holonomic() for l in range(N)]
+for k, vehicle in enumerate(vehicles):
+    vehicle.set_initial_conditions([-4. + 0.5*k, -4.])
+fleet = Fleet(vehicles)
+configuration = RegularPolyhedron(0.3, N, np.pi/4.).vertices.T
+fleet.set_configuration(configuration.tolist())
+fleet.set_terminal_conditions(([3.5, 3.5] + configuration).tolist())
+
+# create environment
+environment = Environment(room={'shape': Square(10.)})
+for k in range(10):
+    position = [-3. + 1.5*(k % 5), -1.5 + 3.*(k/5)]
+    environment.add_obstacle(Obstacle({'position': position}, shape=Circle(0.3)))
+
+# create a formation point-to-point problem
+problem = FormationPoint2pointCentral(fleet, environment,
+                                      options={'horizon_time': 10})
+problem.set_options({'verbose': 0})
+
+problem.init()
+
+# print the phases of the build
+report = problem.get_build_report()
+print '%-14s %8s' % ('phase', 'time (s)')
+for phase, duration in report['phases'].items():
+    print '%-14s %8.3f' % (phase, duration)
+print '%-14s %8.3f' % ('total', report['total'])
+for name, size in report['sizes'].items():
+    print '%-18s %d' % (name, size)
@@ -0,0 +1,48 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from omgtools import *
+import time
+
+# scaling benchmark of problem composition (symbol translation and struct
+# construction) versus the number of obstacles, up to 200
+
+print '%-10s %12s %12s' % ('obstacles', 'symbols (s)', 'structs (s)')
+for n_obs in [25, 50, 100, 200]:
+    vehicle = Holonomic()
+    vehicle.set_initial_conditions([-9., -9.])
+    vehicle.set_terminal_conditions([9., 9.])
+    environment = Environment(room={'shape': Square(20.)})
+    for k in range(n_obs):
+        position = [-8. + 1.2*(k % 14), -8. + 1.2*(k/14)]
+        environment.add_obstacle(Obstacle({'position': position},
+                                          shape=Circle(0.1)))
+    problem = Point2point(vehicle, environment, freeT=False)
+    problem.set_options({'verbose': 0})
+    father = problem.father
+    father.reset()
+    problem.construct()
+    t0 = time.time()
+    father.compose_dictionary()
+    father.translate_symbols()
+    t1 = time.time()
+    father.construct_variables()
+    father.construct_parameters()
+    t2 = time.time()
+    print '%-10d %12.4f %12.4f' % (n_obs, t1-t0, t2-t1)
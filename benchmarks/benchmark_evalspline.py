@@ -0,0 +1,58 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from omgtools import *
+from omgtools.basics.spline import BSplineBasis, BSpline
+from omgtools.basics.spline_extra import definite_integral
+from casadi import MX, Function, gradient
+import time
+
+# scaling benchmark of symbolic spline evaluation versus the number of knot
+# intervals: size, construction and evaluation time of a definite integral
+# with a parametric lower bound, and the build time of a point-to-point nlp
+
+print '%-10s %8s %14s %14s' % ('intervals', 'nodes', 'construct (s)', 'eval (us)')
+for n_int in [10, 20, 40, 80, 160]:
+    degree = 3
+    knots = np.r_[np.zeros(degree), np.linspace(0., 1., n_int+1), np.ones(degree)]
+    basis = BSplineBasis(knots, degree)
+    coeffs, t = MX.sym('c', len(basis)), MX.sym('t')
+    t0 = time.time()
+    integral = definite_integral(BSpline(basis, coeffs), t, 1.)
+    fun = Function('f', [coeffs, t], [integral, gradient(integral, coeffs)])
+    t1 = time.time()
+    c, n_eval = np.random.rand(len(basis)), 1000
+    t2 = time.time()
+    for k in range(n_eval):
+        fun(c, k/float(n_eval))
+    t3 = time.time()
+    print '%-10d %8d %14.4f %14.2f' % (n_int, fun.n_nodes(),
+                                       t1-t0, (t3-t2)/n_eval*1e6)
+
+print '\n%-10s %12s' % ('intervals', 'build (s)')
+for n_int in [10, 20, 40]:
+    vehicle = Holonomic()
+    vehicle.define_knots(knot_intervals=n_int)
+    vehicle.set_initial_conditions([-1.5, -1.5])
+    vehicle.set_terminal_conditions([2., 2.])
+    environment = Environment(room={'shape': Square(5.)})
+    environment.add_obstacle(Obstacle({'position': [0., 0.]}, shape=Circle(0.5)))
+    problem = Point2point(vehicle, environment, freeT=False)
+    problem.set_options({'verbose': 0})
+    print '%-10d %12.4f' % (n_int, problem.init())
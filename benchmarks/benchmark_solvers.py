@@ -0,0 +1,33 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from omgtools import *
+
+# solver benchmark: every available solver setting is run on a matrix of
+# point-to-point scenarios (vehicle type x number of obstacles x free/fixed T)
+# leave out the arguments to run the full matrix with all candidate solvers
+benchmark = SolverBenchmark(vehicles=['holonomic'], n_obstacles=[1],
+                            freeT=[False],
+                            solvers=['ipopt_mumps', 'ipopt_ma27', 'ipopt_ma57'])
+print 'Available solvers: ' + ', '.join(benchmark.solvers.keys())
+
+# run it!
+benchmark.run()
+benchmark.print_summary()
+benchmark.save('solver_benchmark.json')
@@ -0,0 +1,49 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from omgtools import *
+import numpy as np
+
+# create vehicle
+vehicle = Holonomic()
+vehicle.set_options({'safety_distance': 0.1})
+vehicle.set_initial_conditions([-1.5, -1.5])
+vehicle.set_terminal_conditions([2., 2.])
+
+# create environment
+environment = Environment(room={'shape': Square(5.)})
+environment.add_obstacle(Obstacle({'position': [0., 0.]}, shape=Circle(0.5)))
+
+# create and build a point-to-point problem
+problem = Point2point(vehicle, environment, freeT=False)
+problem.set_options({'solver_options': {'ipopt': {'ipopt.print_level': 0,
+                                                  'print_time': 0}}})
+problem.init()
+
+# solve a batch of start/goal/obstacle configurations
+n_queries = 8
+np.random.seed(0)
+initial = np.c_[np.random.uniform(-2., -1., n_queries), np.random.uniform(-2., -1., n_queries)]
+terminal = np.c_[np.random.uniform(1., 2., n_queries), np.random.uniform(1., 2., n_queries)]
+obstacles = [{'position': np.random.uniform(-0.3, 0.3, (n_queries, 2))}]
+result = problem.solve_batch(initial, terminal, obstacles)
+
+print '%d of %d queries solved' % (np.sum(result['success']), n_queries)
+print '%-18s %6g' % ('Queries per second:', result['queries_per_second'])
+print 'Spline coefficients: %s' % (result['splines']['splines0'].shape,)
@@ -94,6 +94,10 @@ multiproblem=MultiFrameProblem(vehicle, environment, globalplanner,
                                options=options, frame_type='min_nobs')
 # multiproblem=MultiFrameProblem(vehicle, environment, globalplanner,
                                # options=options, frame_size=150, frame_type='shift')
+# with 'obstacle_slots', the local problem is built once for a fixed number of
+# obstacles and reused for every frame instead of being rebuilt:
+# multiproblem=MultiFrameProblem(vehicle, environment, globalplanner,
+                               # options=options, frame_type='min_nobs', obstacle_slots=4)
 
 # simulate the problem
 simulator = Simulator(multiproblem)
@@ -110,6 +110,8 @@ options = {}
 options['codegen'] = {'build': None}
 # options['codegen'] = {'build': 'jit', 'flags': '-O2'} # just-in-time compilation
 # options['codegen'] = {'build': 'shared', 'flags': '-O2'} # compile to shared object
+# options['codegen'] = {'build': 'parallel', 'flags': '-O2', 'jobs': 4} # compile shared objects concurrently
+# options['codegen'] = {'build': 'lazy', 'flags': '-O2'} # start uncompiled, swap in shared object when built
 # Compilation of the code takes some time, while execution is slightly faster
 # There are other options, set on a default value. Check them out with
 # problem.options
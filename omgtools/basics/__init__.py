@@ -1,2 +1,5 @@
-from optilayer import OptiChild, OptiFather
+from optilayer import OptiChild, OptiFather, get_cache_stats, reset_cache_stats
+from profiler import BuildProfiler, compare_build_reports
 from shape import *
+from cache import LRUCache
+from spline import get_spline_cache_stats
@@ -0,0 +1,96 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import collections as col
+import numpy as np
+import threading
+
+
+def array_key(value):
+    # cheap, exact key of a numeric array: its shape and raw bytes
+    value = np.atleast_1d(value)
+    if value.dtype.kind not in 'biuf':
+        raise TypeError('Only numeric arrays have a key.')
+    value = np.ascontiguousarray(value, dtype=float)
+    return (value.shape, value.tobytes())
+
+
+class LRUCache(object):
+    # Thread-safe cache that keeps the 'size' most recently used entries and
+    # counts its hits, misses and evictions.
+
+    def __init__(self, size=1000):
+        self.size = size
+        self._lock = threading.RLock()
+        self._entries = col.OrderedDict()
+        self.reset_stats()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            # mark as recently used
+            value = self._entries.pop(key)
+            self._entries[key] = value
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._entries.pop(key)
+            self._entries[key] = value
+            self._evict()
+
+    def get_or_create(self, key, create):
+        # create is called without holding the lock, so it can use the cache
+        value = self.get(key, self)
+        if value is self:
+            value = create()
+            self.put(key, value)
+        return value
+
+    def resize(self, size):
+        with self._lock:
+            self.size = size
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_stats(self):
+        return {'size': self.size, 'entries': len(self._entries),
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+    def reset_stats(self):
+        self.hits, self.misses, self.evictions = 0, 0, 0
@@ -23,13 +23,17 @@ except:
     from casadi import Importer
     Compiler = Importer
 from casadi import DM, MX, inf, Function, nlpsol, external
-from casadi import symvar, substitute
+from casadi import symvar, substitute, veccat
 from casadi.tools import struct, struct_MX, struct_symMX, entry
 from spline import BSpline
+from profiler import BuildProfiler, profile_phase
 from itertools import groupby
+from multiprocessing.pool import ThreadPool
+import multiprocessing
+import threading
 import time
+import hashlib
 import numpy as np
-import copy
 import os
 import shutil
 import collections as col
@@ -44,44 +48,432 @@ def evalf(fun, x):
 # Functions related to c code generation
 # ========================================================================
 
-def create_nlp(var, par, obj, con, options, name=''):
+_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def get_cache_stats():
+    return dict(_cache_stats)
+
+
+def reset_cache_stats():
+    for key in _cache_stats:
+        _cache_stats[key] = 0
+
+
+def _compile_shared(name, generate, codegen, verbose, signature='',
+                    serialize=None):
+    path, job = _generate_shared(name, generate, codegen, verbose, signature,
+                                 serialize)
+    if job is not None:
+        job()
+    return path
+
+
+def _generate_shared(name, generate, codegen, verbose, signature='',
+                     serialize=None):
+    # generate c code for build/name.so, or look it up in the content-
+    # addressed cache when codegen['cache'] is set; returns the path of the
+    # shared object and the job compiling it (None when it already exists)
+    directory = os.path.join(os.getcwd(), 'build')
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    if 'cache' in codegen and codegen['cache']:
+        return _generate_cached(name, generate, codegen, verbose, signature,
+                                serialize)
+    path = os.path.join(directory, name)
+    if verbose >= 1:
+        print('[compile to .so with flags %s]' % (codegen['flags'])),
+    if os.path.isfile(path+'.so'):
+        os.remove(path+'.so')
+    generate(name+'.c')
+    shutil.move(name+'.c', path+'.c')
+    return path, lambda: _gcc(path, path+'.so', codegen['flags'])
+
+
+def _serialize(fun, name):
+    # exact description of the expression graph of fun, which is far cheaper
+    # to obtain than the code of a solver and all derivatives it needs; the
+    # expanded graph leaves out the symbol names, which differ between
+    # instances of the same problem
+    fun = fun.expand()
+    if hasattr(fun, 'serialize'):
+        return fun.serialize()
+    # older casadi versions can not serialize, the code of fun alone is
+    # still much smaller than the code of its dependencies
+    fun.generate(name+'_key.c')
+    with open(name+'_key.c', 'r') as f:
+        code = f.read()
+    os.remove(name+'_key.c')
+    return code
+
+
+def _generate_cached(name, generate, codegen, verbose, signature,
+                     serialize=None):
+    directory = _cache_directory(codegen)
+    # the serialized expressions, together with the flags and the signature
+    # (solver, options and problem layout), identify the shared object; the
+    # code is only generated on a cache miss
+    key = hashlib.sha1()
+    if serialize is None:
+        generate(name+'.c')
+        with open(name+'.c', 'r') as f:
+            key.update(f.read())
+    else:
+        key.update(serialize())
+    key.update(codegen['flags'])
+    key.update(signature)
+    path = os.path.join(directory, key.hexdigest())
+    if os.path.isfile(path+'.so'):
+        _cache_stats['hits'] += 1
+        if verbose >= 1:
+            print('[cache hit %s.so]' % key.hexdigest()[:10]),
+        if serialize is None:
+            os.remove(name+'.c')
+        os.utime(path+'.so', None)  # mark as recently used
+        return path, None
+    _cache_stats['misses'] += 1
+    if verbose >= 1:
+        print('[cache miss, compile to .so with flags %s]' %
+              (codegen['flags'])),
+    if serialize is not None:
+        generate(name+'.c')
+    shutil.move(name+'.c', path+'.c')
+
+    def job():
+        # compile to a temporary file first: a build that is interrupted
+        # should never leave a corrupt shared object behind in the cache
+        _gcc(path, path+'.tmp', codegen['flags'])
+        os.rename(path+'.tmp', path+'.so')
+        _evict_cache(directory, codegen)
+    return path, job
+
+
+def _gcc(path, target, flags):
+    os.system('gcc -fPIC -shared %s %s.c -o %s' % (flags, path, target))
+    os.remove(path+'.c')
+    if not os.path.isfile(target):
+        raise ValueError('Compilation of %s.c failed!' % path)
+
+
+def _cache_directory(codegen):
+    if 'cache_dir' in codegen and codegen['cache_dir'] is not None:
+        directory = codegen['cache_dir']
+    else:
+        directory = os.path.join(os.getcwd(), 'build', 'cache')
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    return directory
+
+
+def _evict_cache(directory, codegen):
+    # remove least recently used shared objects until the cache fits
+    if 'cache_size' not in codegen or codegen['cache_size'] is None:
+        return
+    with _build_lock:
+        _evict_files(directory, codegen['cache_size'])
+
+
+def _evict_files(directory, cache_size):
+    files = [os.path.join(directory, f) for f in os.listdir(directory)
+             if f.endswith('.so')]
+    files = sorted(files, key=os.path.getmtime)
+    size = sum([os.path.getsize(f) for f in files])
+    while size > cache_size and len(files) > 1:
+        f = files.pop(0)
+        size -= os.path.getsize(f)
+        os.remove(f)
+        _cache_stats['evictions'] += 1
+
+
+class BuildHandle(object):
+    # Stands in for a solver or function of which the shared object is still
+    # being compiled in the background. It is loaded on first use, so it can
+    # be passed around as if it were the built object.
+
+    def __init__(self, name, result, load):
+        self.name = name
+        self._result = result
+        self._load = load
+        self._built = None
+
+    def ready(self):
+        return self._built is not None or self._result.ready()
+
+    def wait(self):
+        if self._built is None:
+            self._result.get()  # re-raises compilation errors
+            self._built = self._load()
+        return self._built
+
+    def __call__(self, *args, **kwargs):
+        return self.wait()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.wait(), attr)
+
+
+_build_lock = threading.Lock()
+_build_pool = {'pool': None, 'jobs': None}
+_pending_builds = []
+
+
+def _submit_build(name, job, load, codegen):
+    # gcc runs in its own process, so a pool of threads is enough to keep
+    # that many compilations running at the same time
+    jobs = codegen['jobs'] if 'jobs' in codegen else None
+    jobs = jobs or multiprocessing.cpu_count()
+    if _build_pool['pool'] is None or _build_pool['jobs'] != jobs:
+        if _build_pool['pool'] is not None:
+            _build_pool['pool'].close()
+        _build_pool['pool'] = ThreadPool(jobs)
+        _build_pool['jobs'] = jobs
+    if job is None:
+        result = _build_pool['pool'].apply_async(lambda: None)
+    else:
+        result = _build_pool['pool'].apply_async(job)
+    handle = BuildHandle(name, result, load)
+    _pending_builds.append(handle)
+    return handle
+
+
+def wait_for_builds():
+    # block until all solvers and functions of parallel builds are loaded
+    t0 = time.time()
+    while _pending_builds:
+        _pending_builds.pop(0).wait()
+    return time.time() - t0
+
+
+class LazyBuild(object):
+    # Serves an uncompiled solver or function while its compiled version is
+    # generated and built in a forked process. The compiled one takes over
+    # at the first call after it is loaded, so stats() and other attributes
+    # always belong to the object that did the last evaluation.
+
+    def __init__(self, name, interim, process, receiver, load, verbose=0):
+        self.name = name
+        self._current = interim
+        self._process = process
+        self._receiver = receiver
+        self._load = load
+        self._verbose = verbose
+        self._status = 'building'
+        self._start = time.time()
+        self._build_time = None
+        self._error = None
+        self._path = None
+
+    def ready(self):
+        if self._status == 'building' and self._receiver.poll():
+            self._finish()
+        return self._status != 'building'
+
+    def wait(self):
+        if self._status == 'building':
+            self._receiver.poll(None)
+            self._finish()
+        return self._current
+
+    def _finish(self):
+        try:
+            status, result, cache_stats = self._receiver.recv()
+            # the cache is used by the build process, count it here
+            for key, value in cache_stats.items():
+                _cache_stats[key] += value
+        except EOFError:
+            status, result = 'failed', 'build process exited with code %s' % (
+                self._process.exitcode)
+        self._process.join()
+        self._receiver.close()
+        self._build_time = time.time() - self._start
+        if status == 'ready':
+            self._path = result
+            try:
+                self._current = self._load(result)
+            except Exception as exc:
+                status, result = 'failed', str(exc)
+        if status == 'failed':
+            self._error = result
+            print 'Building %s failed, keeping the uncompiled version: %s' % (
+                self.name, result)
+        elif self._verbose >= 1:
+            print '[%s compiled in background in %5f s]' % (
+                self.name, self._build_time)
+        self._status = status
+
+    def get_status(self):
+        self.ready()
+        elapsed = self._build_time
+        if elapsed is None:
+            elapsed = time.time() - self._start
+        return {'status': self._status, 'compiled': self._status == 'ready',
+                'build_time': elapsed, 'error': self._error}
+
+    def __call__(self, *args, **kwargs):
+        self.ready()
+        return self._current(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self._current, attr)
+
+
+class LazyVariant(object):
+    # Solver with other options, served uncompiled until the compiled code of
+    # a LazyBuild is loaded and built from that code afterwards.
+
+    def __init__(self, build, interim, load):
+        self.name = build.name
+        self._build = build
+        self._current = interim
+        self._load = load
+        self._loaded = False
+
+    def ready(self):
+        return self._build.ready()
+
+    def wait(self):
+        self._build.wait()
+        self._update()
+        return self._current
+
+    def _update(self):
+        if self._loaded or not self._build.ready():
+            return
+        self._loaded = True
+        if self._build._path is not None:
+            try:
+                self._current = self._load(self._build._path)
+            except Exception as exc:
+                print 'Loading %s failed, keeping the uncompiled version: %s' % (
+                    self.name, exc)
+
+    def get_status(self):
+        return self._build.get_status()
+
+    def __call__(self, *args, **kwargs):
+        self._update()
+        return self._current(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self._current, attr)
+
+
+def _lazy_build(name, interim, generate, load, codegen, verbose,
+                signature='', serialize=None):
+    # the forked process generates code from its own copy of the expression
+    # graph, so the parent can keep using the interim object meanwhile
+    receiver, sender = multiprocessing.Pipe(False)
+
+    def job():
+        reset_cache_stats()
+        try:
+            path, build = _generate_shared(name, generate, codegen, verbose,
+                                           signature, serialize)
+            if build is not None:
+                build()
+            sender.send(('ready', path, get_cache_stats()))
+        except Exception as exc:
+            sender.send(('failed', str(exc), get_cache_stats()))
+    process = multiprocessing.Process(target=job)
+    process.daemon = True
+    process.start()
+    sender.close()
+    return LazyBuild(name, interim, process, receiver, load, verbose)
+
+
+def create_nlp(var, par, obj, con, options, name='', profiler=None,
+               callback=None):
+    problem, buildtime, _ = build_nlp(var, par, obj, con, options, name,
+                                      profiler, callback)
+    return problem, buildtime
+
+
+def build_nlp(var, par, obj, con, options, name='', profiler=None,
+              callback=None):
+    # as create_nlp, but also returns a function that creates a solver with
+    # other solver options from the same build (e.g. the same compiled code)
     codegen = options['codegen']
     if options['verbose'] >= 1:
         print 'Building nlp ... ',
     t0 = time.time()
     nlp = {'x': var, 'p': par, 'f': obj, 'g': con}
     slv_opt = options['solver_options'][options['solver']]
-    opt = {}
-    for key, value in slv_opt.items():
-        opt[key] = value
-    opt.update({'expand': True})
-    solver = nlpsol('solver', options['solver'], nlp, opt)
+    signature = '%s %s %d %d %d' % (
+        options['solver'], sorted(slv_opt.items()), var.size, par.size,
+        con.size)
+    if callback is not None:
+        callback.set_dimensions(var.size, par.size, con.size)
+
+    def solver_options(slv_opt, expand=False):
+        opt = dict(slv_opt)
+        if callback is not None:
+            opt['iteration_callback'] = callback
+        if expand:
+            opt['expand'] = True
+        return opt
+    expanded = lambda slv_opt: nlpsol('solver', options['solver'], nlp,
+                                      solver_options(slv_opt, True))
+    with profile_phase(profiler, 'nlpsol'):
+        solver = expanded(slv_opt)
     name = 'nlp' if name == '' else 'nlp_' + name
+    serialize = lambda: _serialize(Function(name, [var, par], [obj, con]),
+                                   name)
     if codegen['build'] == 'jit':
         if options['verbose'] >= 1:
             print('[jit compilation with flags %s]' % (codegen['flags'])),
-        solver.generate_dependencies(name+'.c')
-        compiler = Compiler(
-            name+'.c', 'clang', {'flags': codegen['flags']})
-        problem = nlpsol('solver', options['solver'], compiler, slv_opt)
+        with profile_phase(profiler, 'codegen'):
+            solver.generate_dependencies(name+'.c')
+        with profile_phase(profiler, 'compile'):
+            compiler = Compiler(
+                name+'.c', 'clang', {'flags': codegen['flags']})
+        load = lambda slv_opt: nlpsol('solver', options['solver'], compiler,
+                                      solver_options(slv_opt))
+        with profile_phase(profiler, 'load'):
+            problem = load(slv_opt)
         os.remove(name+'.c')
     elif codegen['build'] == 'shared':
         if os.name == 'nt':
             raise ValueError('Build option is not supported for Windows!')
-        directory = os.path.join(os.getcwd(), 'build')
-        if not os.path.isdir(directory):
-            os.makedirs(directory)
-        path = os.path.join(directory, name)
-        if options['verbose'] >= 1:
-            print('[compile to .so with flags %s]' % (codegen['flags'])),
-        if os.path.isfile(path+'.so'):
-            os.remove(path+'.so')
-        solver.generate_dependencies(name+'.c')
-        shutil.move(name+'.c', path+'.c')
-        os.system('gcc -fPIC -shared %s %s.c -o %s.so' %
-                  (codegen['flags'], path, path))
-        problem = nlpsol('solver', options['solver'], path+'.so', slv_opt)
-        os.remove(path+'.c')
+        with profile_phase(profiler, 'codegen'):
+            path, job = _generate_shared(name, solver.generate_dependencies,
+                                         codegen, options['verbose'],
+                                         signature, serialize)
+        with profile_phase(profiler, 'compile'):
+            if job is not None:
+                job()
+        load = lambda slv_opt: nlpsol('solver', options['solver'], path+'.so',
+                                      solver_options(slv_opt))
+        with profile_phase(profiler, 'load'):
+            problem = load(slv_opt)
+    elif codegen['build'] == 'parallel':
+        if os.name == 'nt':
+            raise ValueError('Build option is not supported for Windows!')
+        with profile_phase(profiler, 'codegen'):
+            path, job = _generate_shared(name, solver.generate_dependencies,
+                                         codegen, options['verbose'],
+                                         signature, serialize)
+        load_so = lambda slv_opt: lambda: nlpsol(
+            'solver', options['solver'], path+'.so', solver_options(slv_opt))
+        problem = _submit_build(name, job, load_so(slv_opt), codegen)
+        # other solvers wait for the same compilation
+        load = lambda slv_opt: BuildHandle(name, problem._result,
+                                           load_so(slv_opt))
+    elif codegen['build'] == 'lazy':
+        if os.name == 'nt':
+            raise ValueError('Build option is not supported for Windows!')
+        load_so = lambda slv_opt: lambda path: nlpsol(
+            'solver', options['solver'], path+'.so', solver_options(slv_opt))
+        problem = _lazy_build(name, solver, solver.generate_dependencies,
+                              load_so(slv_opt), codegen, options['verbose'],
+                              signature, serialize)
+        load = lambda slv_opt: LazyVariant(problem, expanded(slv_opt),
+                                           load_so(slv_opt))
     elif codegen['build'] == 'existing':
         if os.name == 'nt':
             raise ValueError('Build option is not supported for Windows!')
@@ -91,15 +483,19 @@ def create_nlp(var, par, obj, con, options, name=''):
             raise ValueError('%s.so does not exist!', path)
         if options['verbose'] >= 1:
             print('[using shared object %s.so]' % path),
-        problem = nlpsol('solver', options['solver'], path+'.so', slv_opt)
+        load = lambda slv_opt: nlpsol('solver', options['solver'], path+'.so',
+                                      solver_options(slv_opt))
+        with profile_phase(profiler, 'load'):
+            problem = load(slv_opt)
     elif codegen['build'] is None:
         problem = solver
+        load = expanded
     else:
         raise ValueError('Invalid build option.')
     t1 = time.time()
     if options['verbose'] >= 1:
         print 'in %5f s' % (t1-t0)
-    return problem, (t1-t0)
+    return problem, (t1-t0), load
 
 
 def create_function(name, inp, out, options):
@@ -108,6 +504,7 @@ def create_function(name, inp, out, options):
         print 'Building function %s ... ' % name,
     t0 = time.time()
     fun = Function(name, inp, out).expand()
+    serialize = lambda: _serialize(fun, name)
     if codegen['build'] == 'jit':
         if options['verbose'] >= 1:
             print('[jit compilation with flags %s]' % (codegen['flags'])),
@@ -119,20 +516,22 @@ def create_function(name, inp, out, options):
     elif codegen['build'] == 'shared':
         if os.name == 'nt':
             raise ValueError('Build option is not supported for Windows!')
-        directory = os.path.join(os.getcwd(), 'build')
-        if not os.path.isdir(directory):
-            os.makedirs(directory)
-        path = os.path.join(directory, name)
-        if options['verbose'] >= 1:
-            print('[compile to .so with flags %s]' % (codegen['flags'])),
-        if os.path.isfile(path+'.so'):
-            os.remove(path+'.so')
-        fun.generate(name+'.c')
-        shutil.move(name+'.c', path+'.c')
-        os.system('gcc -fPIC -shared %s %s.c -o %s.so' %
-                  (codegen['flags'], path, path))
+        path = _compile_shared(name, fun.generate, codegen,
+                               options['verbose'], serialize=serialize)
         fun = external(name, path+'.so')
-        os.remove(path+'.c')
+    elif codegen['build'] == 'parallel':
+        if os.name == 'nt':
+            raise ValueError('Build option is not supported for Windows!')
+        path, job = _generate_shared(name, fun.generate, codegen,
+                                     options['verbose'], serialize=serialize)
+        load = lambda: external(name, path+'.so')
+        fun = _submit_build(name, job, load, codegen)
+    elif codegen['build'] == 'lazy':
+        if os.name == 'nt':
+            raise ValueError('Build option is not supported for Windows!')
+        load = lambda path: external(name, path+'.so')
+        fun = _lazy_build(name, fun, fun.generate, load, codegen,
+                          options['verbose'], serialize=serialize)
     elif codegen['build'] == 'existing':
         if os.name == 'nt':
             raise ValueError('Build option is not supported for Windows!')
@@ -159,6 +558,7 @@ class OptiFather(object):
         children = children or []
         self.children = col.OrderedDict()
         self.symbol_dict = col.OrderedDict()
+        self.profiler = BuildProfiler()
         for child in children:
             self.add(child)
 
@@ -175,24 +575,42 @@ class OptiFather(object):
     # Problem composition
     # ========================================================================
 
-    def construct_problem(self, options, name='', problem=None):
-        self.compose_dictionary()
-        self.translate_symbols()
-        variables = self.construct_variables()
-        parameters = self.construct_parameters()
-        self.construct_substitutes(variables, parameters)
-        constraints, _, _ = self.construct_constraints(variables, parameters)
-        objective = self.construct_objective(variables, parameters)
+    def construct_problem(self, options, name='', problem=None, callback=None):
+        profiler = self.profiler
+        with profiler.phase('compose_dictionary'):
+            self.compose_dictionary()
+        with profiler.phase('translate_symbols'):
+            self.translate_symbols()
+        with profiler.phase('structs'):
+            variables = self.construct_variables()
+            parameters = self.construct_parameters()
+        with profiler.phase('substitution'):
+            self.construct_substitutes(variables, parameters)
+            constraints, _, _ = self.construct_constraints(variables, parameters)
+            objective = self.construct_objective(variables, parameters)
+        profiler.set_size('variables', self._var_struct.size)
+        profiler.set_size('parameters', self._par_struct.size)
+        profiler.set_size('constraints', self._con_struct.size)
+        # MX expressions have no node count, their functions do; these are
+        # only built when a report is asked for
+        profiler.set_size('nodes_constraints', lambda: Function(
+            'constraints', [variables, parameters], [constraints.cat]).n_nodes())
+        if isinstance(objective, MX):
+            profiler.set_size('nodes_objective', lambda: Function(
+                'objective', [variables, parameters], [objective]).n_nodes())
         self.problem_description = {'var': variables, 'par': parameters,
                                     'obj': objective, 'con': constraints,
                                     'opt': options}
         if problem is None:
-            problem, buildtime = create_nlp(variables, parameters, objective,
-                constraints, options, name)
+            problem, buildtime, self.load_nlp = build_nlp(
+                variables, parameters, objective, constraints, options, name,
+                profiler, callback)
         else:
             buildtime = 0.
-        self.init_variables()
-        self.init_parameters()
+            self.load_nlp = None
+        with profiler.phase('init'):
+            self.init_variables()
+            self.init_parameters()
         return problem, buildtime
 
     def compose_dictionary(self):
@@ -200,13 +618,17 @@ class OptiFather(object):
             self.symbol_dict.update(child.symbol_dict)
 
     def translate_symbols(self):
+        # index the children defining each name as variable or parameter
+        owners = {}
+        for child in self.children.values():
+            for name in child._variables.keys() + child._parameters.keys():
+                if name not in owners:
+                    owners[name] = []
+                if child not in owners[name]:
+                    owners[name].append(child)
         for label, child in self.children.items():
             for name, symbol in child._symbols.items():
-                sym_def = []
-                for _, _child in self.children.items():
-                    if (name in _child._variables or
-                            name in _child._parameters):
-                        sym_def.append(_child)
+                sym_def = owners[name] if name in owners else []
                 if len(sym_def) > 1:
                     raise ValueError('Symbol %s, defined in %s, is defined'
                                      ' multiple times as parameter or'
@@ -228,6 +650,14 @@ class OptiFather(object):
                 entries_child.append(entry(name, shape=var.shape))
             entries.append(entry(label, struct=struct(entries_child)))
         self._var_struct = struct(entries)
+        self._cache = {}
+        self._var_index = col.OrderedDict()
+        offset = 0
+        for child in self.children.values():
+            for name, var in child._variables.items():
+                size = int(np.prod(var.shape))
+                self._var_index[(child, name)] = (offset, size, var.shape)
+                offset += size
         return struct_symMX(self._var_struct)
 
     def construct_parameters(self):
@@ -238,28 +668,58 @@ class OptiFather(object):
                 entries_child.append(entry(name, shape=par.shape))
             entries.append(entry(label, struct=struct(entries_child)))
         self._par_struct = struct(entries)
+        self._construct_parameter_index()
         return struct_symMX(self._par_struct)
 
+    def _construct_parameter_index(self):
+        # offset, length and shape of every parameter in the flat parameter
+        # vector, such that it can be filled without casadi structs
+        self._par_index = col.OrderedDict()
+        offset = 0
+        for child in self.children.values():
+            for name, par in child._parameters.items():
+                size = int(np.prod(par.shape))
+                self._par_index[(child, name)] = (offset, size, par.shape)
+                offset += size
+        self._par_result = np.zeros(offset)
+
     def construct_substitutes(self, variables, parameters):
         self.substitutes = {}
+        self._subst_index = {}
+        keys, expressions = [], []
         for child in self.children.values():
-            self.substitutes[child] = {}
             for name, subst in child._substitutes.items():
-                expr, _ = subst
-                expression = self._substitute_symbols(expr, variables, parameters)
-                self.substitutes[child][name] = Function(name, [variables, parameters], [expression])
+                keys.append((child, name))
+                expressions.append(subst[0])
+        expressions = self._substitute_symbols(expressions, variables, parameters)
+        for child in self.children.values():
+            self.substitutes[child] = {}
+        for (child, name), expression in zip(keys, expressions):
+            self.substitutes[child][name] = Function(name, [variables, parameters], [expression])
+            self._subst_index[(child, name)] = len(self._subst_index)
+        # all substitutes are evaluated at once, when the first one is needed
+        if expressions:
+            self._substitutes_fun = Function('substitutes', [variables, parameters], expressions)
+        else:
+            self._substitutes_fun = None
 
     def construct_constraints(self, variables, parameters):
-        entries = []
+        names, expressions = [], []
         for child in self.children.values():
             for name, constraint in child._constraints.items():
-                expression = self._substitute_symbols(
-                    constraint[0], variables, parameters)
-                entries.append(entry(child._add_label(name), expr=expression))
+                names.append(child._add_label(name))
+                expressions.append(constraint[0])
+        expressions = self._substitute_symbols(expressions, variables, parameters)
+        entries, sizes = [], []
+        for name, expression in zip(names, expressions):
+            entries.append(entry(name, expr=expression))
+            sizes.append(int(np.prod(expression.shape)))
         self._con_struct = struct(entries)
         constraints = struct_MX(entries)
         self._lb, self._ub = constraints(0), constraints(0)
         self._constraint_shutdown = {}
+        self._con_index = col.OrderedDict()
+        offset = 0
         for child in self.children.values():
             for name, constraint in child._constraints.items():
                 self._lb[child._add_label(name)] = constraint[1]
@@ -267,29 +727,80 @@ class OptiFather(object):
                 if constraint[3]:
                     self._constraint_shutdown[
                         child._add_label(name)] = constraint[3]
+                size = sizes[len(self._con_index)]
+                self._con_index[child._add_label(name)] = np.arange(
+                    offset, offset+size)
+                offset += size
+        self._construct_shutdown()
         return constraints, self._lb, self._ub
 
+    def _construct_shutdown(self):
+        # flat bounds and one compiled predicate per distinct shutdown
+        # condition together with the indices of all constraints it switches
+        # off, such that updating the bounds is a couple of numpy operations
+        self._lb_flat = np.array(self._lb.cat).ravel()
+        self._ub_flat = np.array(self._ub.cat).ravel()
+        conditions = col.OrderedDict()
+        for name, shutdown in self._constraint_shutdown.items():
+            if shutdown not in conditions:
+                conditions[shutdown] = []
+            conditions[shutdown].append(self._con_index[name])
+        self._shutdown = []
+        for shutdown, indices in conditions.items():
+            shutdown_fun = eval('lambda t: %s' % shutdown)
+            self._shutdown.append((shutdown_fun, np.concatenate(indices)))
+
     def construct_objective(self, variables, parameters):
+        objectives = [child._objective for child in self.children.values()]
         objective = 0.
-        for child in self.children.values():
-            objective += self._substitute_symbols(
-                child._objective, variables, parameters)
+        for obj in self._substitute_symbols(objectives, variables, parameters):
+            objective += obj
         return objective
 
     def reset(self):
         for child in self.children.values():
             child.reset()
 
+    def check_children(self):
+        # do the variables and parameters of the children still fit the
+        # constructed problem?
+        for index, dictionary in [(self._var_index, '_variables'),
+                                  (self._par_index, '_parameters')]:
+            names = [(child, name) for child in self.children.values()
+                     for name in getattr(child, dictionary).keys()]
+            if names != index.keys():
+                return False
+            for (child, name), (_, _, shape) in index.items():
+                if getattr(child, dictionary)[name].shape != shape:
+                    return False
+        return True
+
     def _substitute_symbols(self, expr, variables, parameters):
-        if isinstance(expr, (int, float)):
+        # collect the symbols of all expressions at once and map them by name
+        # on the struct entries they stand for, such that a single
+        # substitution call suffices
+        exprs = expr if isinstance(expr, list) else [expr]
+        index = [k for k, e in enumerate(exprs) if isinstance(e, MX)]
+        if not index:
             return expr
-        for sym in symvar(expr):
+        subst = [exprs[k] for k in index]
+        sym_from, sym_to = [], []
+        for sym in symvar(veccat(*subst)):
             [child, name] = self.symbol_dict[sym.name()]
             if name in child._variables:
-                expr = substitute(expr, sym, variables[child.label, name])
+                sym_from.append(sym)
+                sym_to.append(variables[child.label, name])
             elif name in child._parameters:
-                expr = substitute(expr, sym, parameters[child.label, name])
-        return expr
+                sym_from.append(sym)
+                sym_to.append(parameters[child.label, name])
+        if sym_from:
+            subst = substitute(subst, sym_from, sym_to)
+        if not isinstance(expr, list):
+            return subst[0]
+        exprs = list(exprs)
+        for k, e in zip(index, subst):
+            exprs[k] = e
+        return exprs
 
     def _evaluate_symbols(self, expression, variables, parameters):
         symbols = symvar(expression)
@@ -309,37 +820,94 @@ class OptiFather(object):
     # ========================================================================
 
     def update_bounds(self, current_time):
-        lb, ub = copy.deepcopy(self._lb), copy.deepcopy(self._ub)
-        for name, shutdown in self._constraint_shutdown.items():
-            exec('shutdown_fun = lambda t: %s' % shutdown)
+        lb, ub = self._lb_flat.copy(), self._ub_flat.copy()
+        for shutdown_fun, indices in self._shutdown:
             if shutdown_fun(current_time):
-                lb[name], ub[name] = -inf, +inf
+                lb[indices], ub[indices] = -inf, +inf
         return lb, ub
 
     def init_variables(self):
-        variables = self._var_struct(0.)
-        for label, child in self.children.items():
-            for name in child._variables.keys():
-                variables[label, name] = child._values[name]
-        self._var_result = variables
-        self._dual_var_result = self._con_struct(0.)
+        self._var_result = np.zeros(self._var_struct.size)
+        for child, name in self._var_index.keys():
+            self._write_variable(child, name, child._values[name])
+        self._dual_var_result = np.zeros(self._con_struct.size)
+        self._dual_bound_result = np.zeros(self._var_struct.size)
+        self._cache = {}
 
     def init_parameters(self):
         self.set_parameters(0.)
 
     def set_variables(self, variables, child=None, name=None):
         if child is None:
-            self._var_result = self._var_struct(variables)
-        elif name is None:
-            self._var_result[child.label] = variables
+            self._var_result = np.array(variables, dtype=float).ravel()
         else:
-            self._var_result[child.label, name] = variables
+            # copy on write: views handed out before stay valid
+            self._var_result = self._var_result.copy()
+            if name is None:
+                for (chld, name), _ in self._var_index.items():
+                    if chld == child:
+                        self._write_variable(child, name, variables[name])
+            else:
+                self._write_variable(child, name, variables)
+        self._cache = {}
+
+    def set_dual_variables(self, dual_variables, bound_dual_variables=None):
+        self._dual_var_result = np.array(dual_variables, dtype=float).ravel()
+        if bound_dual_variables is not None:
+            self._dual_bound_result = np.array(
+                bound_dual_variables, dtype=float).ravel()
+
+    def get_dual_variables(self):
+        # multipliers of the constraints
+        return self._dual_var_result
+
+    def get_bound_dual_variables(self):
+        # multipliers of the variable bounds
+        return self._dual_bound_result
+
+    def _write_variable(self, child, name, value):
+        offset, size, _ = self._var_index[(child, name)]
+        # casadi stores matrices column-major
+        self._var_result[offset:offset+size] = np.ravel(value, order='F')
+
+    def _get_variable_vector(self):
+        if 'vector' not in self._cache:
+            value = self._var_result.view()
+            value.flags.writeable = False
+            self._cache['vector'] = value
+        return self._cache['vector']
+
+    def _get_variable_value(self, child, name):
+        # read-only view on the current solution, no copy is made
+        if (child, name) not in self._cache:
+            offset, size, shape = self._var_index[(child, name)]
+            value = self._var_result[offset:offset+size].reshape(shape, order='F')
+            value.flags.writeable = False
+            self._cache[(child, name)] = value
+        return self._cache[(child, name)]
+
+    def _get_substitute_value(self, child, name):
+        if 'substitutes' not in self._cache:
+            values = self._substitutes_fun(self._var_result, self._par_result)
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            self._cache['substitutes'] = [np.array(v) for v in values]
+        return self._cache['substitutes'][self._subst_index[(child, name)]]
+
+    def _get_spline_value(self, child, name, coeffs):
+        if (child, name, 'spline') not in self._cache:
+            basis = child._splines_prim[name]['basis']
+            self._cache[(child, name, 'spline')] = [
+                BSpline(basis, coeffs[:, k]) for k in range(coeffs.shape[1])]
+        return self._cache[(child, name, 'spline')]
 
     def get_variables(self, child=None, name=None, **kwargs):
         if child is None:
-            return self._var_result
+            # read-only view on the flat variable vector (no struct, as
+            # before), use set_variables to change it
+            return self._get_variable_vector()
         elif name is None:
-            return self._var_result.prefix(child.label)
+            return self._var_struct(self._var_result).prefix(child.label)
         else:
             if name in child._substitutes:
                 if name in child._splines_prim and not ('spline' in kwargs and not kwargs['spline']):
@@ -349,10 +917,10 @@ class OptiFather(object):
                             coeffs = child._substitutes[name][1]
                         else:
                             coeffs = child._substitutes[name][0]
+                        return [BSpline(basis, coeffs[:, k]) for k in range(coeffs.shape[1])]
                     else:
-                        fun = self.substitutes[child][name]
-                        coeffs = np.array(fun(self._var_result, self._par_result))
-                    return [BSpline(basis, coeffs[:, k]) for k in range(coeffs.shape[1])]
+                        coeffs = self._get_substitute_value(child, name)
+                        return self._get_spline_value(child, name, coeffs)
                 else:
                     if 'symbolic' in kwargs and kwargs['symbolic']:
                         if 'substitute' in kwargs and not kwargs['substitute']:
@@ -360,74 +928,80 @@ class OptiFather(object):
                         else:
                             return child._substitutes[name][0]
                     else:
-                        fun = self.substitutes[child][name]
-                        return np.array(fun(self._var_result, self._par_result))
+                        return self._get_substitute_value(child, name)
             if name in child._splines_prim and not ('spline' in kwargs and not kwargs['spline']):
                 basis = child._splines_prim[name]['basis']
                 if 'symbolic' in kwargs and kwargs['symbolic']:
                     coeffs = child._variables[name]
+                    return [BSpline(basis, coeffs[:, k]) for k in range(coeffs.shape[1])]
                 else:
-                    coeffs = np.array(self._var_result[child.label, name])
-                return [BSpline(basis, coeffs[:, k]) for k in range(coeffs.shape[1])]
+                    coeffs = self._get_variable_value(child, name)
+                    return self._get_spline_value(child, name, coeffs)
             else:
                 if 'symbolic' in kwargs and kwargs['symbolic']:
                     return child._variables[name]
                 else:
-                    return np.array(self._var_result[child.label, name])
+                    return self._get_variable_value(child, name)
 
     def get_parameters(self, child=None, name=None, **kwargs):
         if child is None:
-            return self._par_result
+            return self._par_struct(self._par_result)
         elif name is None:
-            return self._par_result.prefix(child.label)
+            return self._par_struct(self._par_result).prefix(child.label)
         else:
             if name in child._splines_prim and not ('spline' in kwargs and not kwargs['spline']):
                 basis = child._splines_prim[name]['basis']
                 if 'symbolic' in kwargs and kwargs['symbolic']:
                     coeffs = child._parameters[name]
                 else:
-                    coeffs = np.array(self._par_result[child.label, name])
+                    coeffs = self._get_parameter_value(child, name)
                 return [BSpline(basis, coeffs[:, k]) for k in range(coeffs.shape[1])]
             else:
                 if 'symbolic' in kwargs and kwargs['symbolic']:
                     return child._parameters[name]
                 else:
-                    return np.array(self._par_result[child.label, name])
+                    return self._get_parameter_value(child, name)
+
+    def _get_parameter_value(self, child, name):
+        offset, size, shape = self._par_index[(child, name)]
+        return self._par_result[offset:offset+size].reshape(shape, order='F').copy()
 
     def get_constraint(self, child, name, symbolic=False):
         if symbolic:
             return child._constraints[name][0]
         else:
             return self._evaluate_symbols(self.children[child.label]._constraints[name][0],
-                self._var_result, self._par_result)
+                self._var_struct(self._var_result), self.get_parameters())
 
     def get_objective(self, child, name, symbolic=False):
         if symbolic:
             return child._objective
         else:
             return self._evaluate_symbols(self.children[child.label]._objective,
-                self._var_result, self._par_result)
+                self._var_struct(self._var_result), self.get_parameters())
 
     def set_parameters(self, time):
-        self._par_result = self._par_struct(0.)
-        parameters = {}
-        for label, child in self.children.items():
-            par = child.set_parameters(time)
-            for chld, dic in par.items():
-                if chld not in parameters:
-                    parameters[chld] = {}
-                for key in dic.keys():
-                    if key in parameters[chld]:
+        written = set()
+        for child in self.children.values():
+            for chld, dic in child.set_parameters(time).items():
+                for name, value in dic.items():
+                    if (chld, name) in written:
                         raise ValueError('Same parameter set multiple times!')
-                parameters[chld].update(par[chld])
-        for label, child in self.children.items():
-            for name in child._parameters.keys():
-                if child in parameters and name in parameters[child]:
-                    self._par_result[label, name] = parameters[child][name]
-                else:
-                    self._par_result[label, name] = child._values[name]
+                    written.add((chld, name))
+                    if (chld, name) in self._par_index:
+                        self._write_parameter(chld, name, value)
+        for child, name in self._par_index.keys():
+            if (child, name) not in written:
+                self._write_parameter(child, name, child._values[name])
+        if 'substitutes' in self._cache:
+            del self._cache['substitutes']
         return self._par_result
 
+    def _write_parameter(self, child, name, value):
+        offset, size, _ = self._par_index[(child, name)]
+        # casadi stores matrices column-major
+        self._par_result[offset:offset+size] = np.ravel(value, order='F')
+
     # ========================================================================
     # Spline tranformations
     # ========================================================================
@@ -452,30 +1026,33 @@ class OptiFather(object):
                 child._splines_dual[name]['init'] = _init_tf[basis]
 
     def transform_primal_splines(self, transform_fun):
+        self._var_result = self._var_result.copy()
         for label, child in self.children.items():
             for name, spl in child._splines_prim.items():
                 if name in child._variables:
                     basis = spl['basis']
                     init = spl['init']
+                    coeffs = self._get_variable_value(child, name)
                     if init is not None:
-                        self._var_result[label, name] = transform_fun(
-                            self._var_result[label, name], basis, init)
+                        coeffs = transform_fun(coeffs, basis, init)
                     else:
-                        self._var_result[label, name] = transform_fun(
-                            self._var_result[label, name], basis)
+                        coeffs = transform_fun(coeffs, basis)
+                    self._write_variable(child, name, coeffs)
+        self._cache = {}
 
     def transform_dual_splines(self, transform_fun):
         for label, child in self.children.items():
             for name, spl in child._splines_dual.items():
                 basis = spl['basis']
                 init = spl['init']
+                index = self._con_index[child._add_label(name)]
+                coeffs = self._dual_var_result[index].reshape(
+                    len(basis), -1, order='F')
                 if init is not None:
-                    init = spl['init']
-                    self._dual_var_result[label, name] = transform_fun(
-                        self._dual_var_result[label, name], basis, init)
+                    coeffs = transform_fun(coeffs, basis, init)
                 else:
-                    self._dual_var_result[label, name] = transform_fun(
-                        self._dual_var_result[label, name], basis)
+                    coeffs = transform_fun(coeffs, basis)
+                self._dual_var_result[index] = np.ravel(coeffs, order='F')
 
 
 class OptiChild(object):
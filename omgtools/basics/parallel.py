@@ -0,0 +1,48 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import multiprocessing
+import os
+
+# casadi objects can not be pickled, so worker processes are forked after the
+# task is stored here and inherit it, solvers included
+_task = {}
+
+
+def _run(index):
+    return _task['function'](_task['items'][index])
+
+
+def fork_map(function, items, processes=None):
+    # evaluate function for every item in forked worker processes; the results
+    # are pickled, so they should be plain python or numpy objects
+    items = list(items)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes, len(items))
+    if processes <= 1 or os.name == 'nt':
+        return [function(item) for item in items]
+    _task['function'], _task['items'] = function, items
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_run, range(len(items)))
+    finally:
+        pool.close()
+        pool.join()
+        _task.clear()
@@ -0,0 +1,111 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from contextlib import contextmanager
+import collections as col
+import json
+import time
+
+
+class BuildProfiler(object):
+    # Collects the time spent in every phase of a problem build, together
+    # with the problem dimensions, in a report that can be stored as json.
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.report = col.OrderedDict()
+        self.report['children'] = col.OrderedDict()
+        self.report['phases'] = col.OrderedDict()
+        self.report['sizes'] = col.OrderedDict()
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.time()
+        yield
+        self.add_time('phases', name, time.time()-t0)
+
+    @contextmanager
+    def child(self, label):
+        t0 = time.time()
+        yield
+        self.add_time('children', label, time.time()-t0)
+
+    def add_time(self, category, name, duration):
+        if name not in self.report[category]:
+            self.report[category][name] = 0.
+        self.report[category][name] += duration
+
+    def set_size(self, name, size):
+        # size can be a function, which is only called when a report is made
+        self.report['sizes'][name] = size
+
+    def get_report(self):
+        for name, size in self.report['sizes'].items():
+            if callable(size):
+                self.report['sizes'][name] = size()
+        report = json.loads(json.dumps(self.report),
+                            object_pairs_hook=col.OrderedDict)
+        # the children are timed as part of the construct phase
+        report['total'] = sum(self.report['phases'].values())
+        return report
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.get_report(), f, indent=2)
+
+
+@contextmanager
+def profile_phase(profiler, name):
+    # phase of an optional profiler
+    if profiler is None:
+        yield
+    else:
+        with profiler.phase(name):
+            yield
+
+
+@contextmanager
+def profile_child(profiler, label):
+    # child of an optional profiler
+    if profiler is None:
+        yield
+    else:
+        with profiler.child(label):
+            yield
+
+
+def compare_build_reports(reference, report, tolerance=0.2):
+    # return the phases of report that are more than tolerance (relative)
+    # slower than in reference, as {phase: (reference time, time)}
+    if isinstance(reference, str):
+        with open(reference, 'r') as f:
+            reference = json.load(f)
+    if isinstance(report, str):
+        with open(report, 'r') as f:
+            report = json.load(f)
+    regressions = col.OrderedDict()
+    for category in ['children', 'phases']:
+        for name, duration in report[category].items():
+            if name in reference[category]:
+                ref = reference[category][name]
+                if duration > (1.+tolerance)*ref:
+                    regressions[name] = (ref, duration)
+    return regressions
@@ -18,58 +18,79 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
 import functools
+import threading
+import weakref
 #import cvxopt
 import numpy as np
 import scipy.linalg as la
 import casadi as cas
-from scipy.sparse import csr_matrix
+from scipy.sparse import csr_matrix, csc_matrix
 # from piecewise import PiecewisePolynomial as ppoly
 # from scipy.sparse.linalg import spsolve
 from collections import Counter
-import md5
+from cache import LRUCache, array_key
 
 NO_POINTS = 501
 
+# bases and their evaluations are shared, in caches of bounded size
+basis_cache = LRUCache(500)
+# bases that are still used are never replaced by an equal instance, even
+# when evicted from basis_cache: code that compares bases by identity or
+# keys on them keeps seeing one instance
+_live_bases = weakref.WeakValueDictionary()
+_live_lock = threading.Lock()
+eval_cache = LRUCache(2000)
+transform_cache = LRUCache(500)
+horizon_cache = LRUCache(500)
 
-def memoize(f):
-    """ Memoization decorator"""
-    class memodict(dict):
-        def __init__(self, f):
-            self.f = f
-
-        def __call__(self, *args):
-            key = (args[0], md5.new(np.atleast_1d(args[1])).digest())
-            if key in self:
-                return self[key]
-            else:
-                ret = self[key] = self.f(*args)
-                return ret
 
-        def __get__(self, obj, objtype):
-            return functools.partial(self.__call__, obj)
-    return memodict(f)
+def get_spline_cache_stats():
+    return {'basis': dict(basis_cache.get_stats(), live=len(_live_bases)),
+            'eval_basis': eval_cache.get_stats(),
+            'transform': transform_cache.get_stats(),
+            'horizon': horizon_cache.get_stats()}
+
+
+def memoize(f):
+    """ Memoization decorator for evaluations of a basis in x"""
+    @functools.wraps(f)
+    def memoized(self, x):
+        try:
+            key = (f.__name__, self.__class__, self.degree,
+                   array_key(self.knots), array_key(x))
+        except TypeError:  # Can't cache this argument
+            return f(self, x)
+        return eval_cache.get_or_create(key, lambda: f(self, x))
+    return memoized
 
 
 def cached_class(klass):
     """Decorator to cache class instances by constructor arguments.
     """
-    cache = {}
-
     @functools.wraps(klass, assigned=('__name__', '__module__'), updated=())
     class _decorated(klass):
         __doc__ = klass.__doc__
 
         def __new__(cls, *args, **kwds):
-            key = (cls,) + tuple([md5.new(np.atleast_1d(k)).digest() for k in args]) + tuple(kwds.iteritems())
             try:
-                inst = cache.get(key, None)
+                key = ((cls,) + tuple([array_key(k) for k in args]) +
+                       tuple(sorted(kwds.items())))
+                hash(key)
             except TypeError:  # Can't cache this set of arguments
-                inst = key = None
-            if inst is None:
+                key = None
+            if key is None:
                 inst = klass(*args, **kwds)
                 inst.__class__ = cls
-                if key is not None:
-                    cache[key] = inst
+                return inst
+            inst = basis_cache.get(key)
+            if inst is None:
+                with _live_lock:
+                    inst = _live_bases.get(key)
+                    if inst is None:
+                        inst = klass(*args, **kwds)
+                        inst.__class__ = cls
+                        _live_bases[key] = inst
+                basis_cache.put(key, inst)
             return inst
 
         def __init__(self, *args, **kwds):
@@ -183,6 +204,9 @@ class Basis(object):
 
     def greville(self):
         """Return the Greville abscissae of the basis"""
+        if self.degree == 0:
+            return [0.5 * (self.knots[k] + self.knots[k + 1])
+                    for k in range(len(self))]
         return [1. / self.degree * sum(self.knots[k + 1:k + self.degree + 1])
                 for k in range(len(self))]
 
@@ -196,24 +220,39 @@ class BSplineBasis(Basis):
     def eval_basis(self, x):
         """Evaluate the BSplineBasis at x.
 
-        This function implements the Cox-de Boor formula for B-splines
+        This function implements the Cox-de Boor formula for B-splines,
+        vectorized over x: only the degree + 1 basis functions that are
+        nonzero on the knot interval of each point are evaluated. Intervals
+        are open on the left and closed on the right, except for the first
+        one. Points outside the knot range give a zero row.
         """
-        x = np.array(x)
-        k = self.knots
-        basis = [[self._ind(i, x) * 1.0 for i in range(len(k) - 1)]]
-        for d in range(1, self.degree + 1):
-            basis.append([])
-            for i in range(len(k) - d - 1):
-                b = 0 * x
-                bottom = k[i + d] - k[i]
-                if bottom != 0:
-                    b = (x - k[i]) * basis[d - 1][i] / bottom
-                bottom = k[i + d + 1] - k[i + 1]
-                if bottom != 0:
-                    b += (k[i + d + 1] - x) * basis[d - 1][i + 1] / bottom
-                basis[-1].append(b)
-        # Consider sparse matrices?
-        return csr_matrix_alt(np.c_[basis[-1]].T)
+        x = np.atleast_1d(np.array(x, dtype=float)).ravel()
+        d = self.degree
+        # pad the knots, so every interval has d knots at both sides
+        k = np.r_[[self.knots[0]] * d, self.knots, [self.knots[-1]] * d]
+        span = np.searchsorted(k, x, side='left') - 1
+        span[x == k[0]] = np.searchsorted(k, k[0], side='right') - 1
+        valid = (x >= k[0]) & (x <= k[-1]) & (span >= d) & (span < len(k) - d - 1)
+        x, span, rows = x[valid], span[valid], np.arange(len(valid))[valid]
+        N = np.zeros((len(x), d + 1))
+        N[:, 0] = 1.
+        left = np.zeros((d + 1, len(x)))
+        right = np.zeros((d + 1, len(x)))
+        for j in range(1, d + 1):
+            left[j] = x - k[span + 1 - j]
+            right[j] = k[span + j] - x
+            saved = 0.
+            for r in range(j):
+                temp = N[:, r] / (right[r + 1] + left[j - r])
+                N[:, r] = saved + right[r + 1] * temp
+                saved = left[j - r] * temp
+            N[:, j] = saved
+        # column of the basis functions in the unpadded basis
+        cols = span[:, None] - 2 * d + np.arange(d + 1)
+        keep = (cols >= 0) & (cols < len(self)) & (N != 0.)
+        return csr_matrix_alt((N[keep], (np.repeat(rows, d + 1)[keep.ravel()],
+                                         cols[keep])),
+                              shape=(len(valid), len(self)))
 
     def derivative(self, o=1):
         """Returns derivative of the basisfunctions
@@ -265,27 +304,73 @@ class BSplineBasis(Basis):
     def transform(self, other, TOL=1e-10):
         """Transformation from one basis to another.
 
-        Returns a transformation matrix T such that
+        Returns a sparse transformation matrix T such that
 
             self(x).T = other(x)
 
-        TODO: Can we use the greville points instead of max?
+        by collocation in the Greville abscissae of self, which is exact when
+        other lies in the span of self. The collocation matrix is banded.
+        Other is a basis or a function that evaluates the functions to
+        transform in given points. Transformations between bases are cached.
         """
-        b = self(self._x).toarray()
-        m = np.argmax(b, axis=0)
-        # x = np.linspace(self.knots[0], self.knots[-1], NO_POINTS)
-        xmax = self._x[m]
         if isinstance(other, BSplineBasis):
-            # if (self.knots[0] == other.knots[0] and
-            #    self.knots[-1] == other.knots[-1]):
-            T = la.solve(b[m, :], other(xmax).toarray())
-        else:
+            key = (self.degree, array_key(self.knots),
+                   other.degree, array_key(other.knots))
+            return transform_cache.get_or_create(
+                key, lambda: self._transform(other, TOL))
+        return self._transform(other, TOL)
+
+    def _transform(self, other, TOL):
+        def evaluate(x):
+            values = other(x)
+            return values.toarray() if hasattr(values, 'toarray') else np.array(values)
+        try:
+            x = np.array(self.greville())
+            return self._collocate(csc_matrix(other(x)), TOL)
+        except la.LinAlgError:  # Singular collocation, fit on a fine grid
+            T = la.lstsq(self(self._x).toarray(), evaluate(self._x))[0]
+            T[abs(T) < TOL] = 0.
+            return csr_matrix_alt(T)
+
+    def _collocate(self, V, TOL):
+        # Solve B.T = V, with B the banded collocation matrix. Every column
+        # of T is solved on the support of its column in V, widened with the
+        # bandwidth of B, and on the full system if that is not exact.
+        B = self(np.array(self.greville())).tocsr()
+        b = B.tocoo()
+        lower = max(np.max(b.row - b.col), 0)
+        upper = max(np.max(b.col - b.row), 0)
+        width = max(lower, upper)
+        n, banded = len(self), None
+        rows, cols, data = [], [], []
+        for j in range(V.shape[1]):
+            index = V.indices[V.indptr[j]:V.indptr[j+1]]
+            if index.size == 0:
+                continue
+            v = np.zeros(n)
+            v[index] = V.data[V.indptr[j]:V.indptr[j+1]]
+            i0 = max(index.min() - width, 0)
+            i1 = min(index.max() + width + 1, n)
+            r0, r1 = max(i0 - width, 0), min(i1 + width, n)
+            block = B[r0:r1, i0:i1]
             try:
-                T = la.solve(b[m, :], other(xmax))
-            except:  # In case of multiplication
-                T = la.solve(b[m, :], other(m))
-        T[abs(T) < TOL] = 0.
-        return csr_matrix_alt(T)
+                t = np.linalg.solve(block[i0-r0:i1-r0].toarray(), v[i0:i1])
+                exact = np.allclose(block.dot(t), v[r0:r1])
+            except la.LinAlgError:
+                exact = False
+            if not exact:
+                if banded is None:
+                    banded = _banded(b, lower, upper)
+                i0, t = 0, la.solve_banded((lower, upper), banded, v)
+            nonzero = np.flatnonzero(abs(t) >= TOL)
+            rows.append(nonzero + i0)
+            cols.append(j*np.ones(nonzero.size, dtype=int))
+            data.append(t[nonzero])
+        if not data:
+            return csr_matrix_alt((n, V.shape[1]))
+        return csr_matrix_alt((np.concatenate(data),
+                               (np.concatenate(rows), np.concatenate(cols))),
+                              shape=(n, V.shape[1]))
 
     def as_poly(self):
         """Returns polynomial description of the basis functions"""
@@ -306,6 +391,13 @@ class BSplineBasis(Basis):
         return basis[-1]
 
 
+def _banded(b, lower, upper):
+    # matrix in coo format to the banded storage of scipy.linalg.solve_banded
+    banded = np.zeros((lower + upper + 1, b.shape[1]))
+    banded[upper + b.row - b.col, b.col] = b.data
+    return banded
+
+
 class NurbsBasis(Basis):
     def __init__(self, knots, degree, weights):
         self.weights = weights
@@ -395,10 +487,8 @@ class BSpline(Spline):
         if isinstance(other, self.__class__):
             basis = self.basis * other.basis
             pairs, S = self.basis.pairs(other.basis)
-            b_self = self.basis(basis._x)
-            b_other = other.basis(basis._x)
-            basis_product = b_self[:, pairs[0]].multiply(b_other[:, pairs[1]])
-            T = basis.transform(lambda y: basis_product.toarray()[y, :])
+            T = basis.transform(lambda x: self.basis(x)[:, pairs[0]].multiply(
+                other.basis(x)[:, pairs[1]]))
             try:
                 coeffs_product = (self.coeffs[pairs[0].tolist()] *
                                   other.coeffs[pairs[1].tolist()])
@@ -506,10 +596,8 @@ class Nurbs(Spline):
             dnum = self.num.derivative()
             ddenom = self.denom.derivative()
             coeffs_product = dnum.coeffs[pairs[1].tolist()] * self.denom.coeffs[pairs[0].tolist()] - self.num.coeffs[pairs[0].tolist()] * ddenom.coeffs[pairs[1].tolist()]
-            bx = b(denom2.basis._x)
-            dbx = db(denom2.basis._x)
-            basis_product = bx[:, pairs[0]].multiply(dbx[:, pairs[1]])
-            T = denom2.basis.transform(lambda y: basis_product.toarray()[y, :])
+            T = denom2.basis.transform(
+                lambda x: b(x)[:, pairs[0]].multiply(db(x)[:, pairs[1]]))
             coeffs = T.dot(coeffs_product) / denom2.coeffs
             basis = NurbsBasis(denom2.basis.knots, denom2.basis.degree, denom2.coeffs)
             return self.__class__(basis, coeffs)
@@ -605,10 +693,10 @@ class TensorBSpline(object):
                 return NotImplementedError("Too complex to implement :-)")
             basis = map(lambda x, y: x * y, self.basis, other.basis)
             pairs = map(lambda x, y: x.pairs(y)[0], self.basis, other.basis)
-            basis_product = map(lambda x, y, p, b: x(b._x)[:, p[0]].multiply(y(b._x)[:, p[1]]), self.basis, other.basis, pairs, basis)
+            basis_product = map(lambda x, y, p: lambda z: x(z)[:, p[0]].multiply(y(z)[:, p[1]]), self.basis, other.basis, pairs)
             coeffs_product = (self.coeffs[pairs[0][0]].T[pairs[1][0]] *
                               other.coeffs[pairs[0][1]].T[pairs[1][1]])
-            T = map(lambda x, b: b.transform(lambda y: x.toarray()[y, :]), basis_product, basis)
+            T = map(lambda x, b: b.transform(x), basis_product, basis)
             coeffs = coeffs_product.T
             for i, t in enumerate(T):
                 coeffs = np.tensordot(t.toarray(), coeffs.swapaxes(0, i), axes=[1, 0]).swapaxes(0, i)
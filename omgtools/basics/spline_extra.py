@@ -17,70 +17,105 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
-from spline import BSpline, BSplineBasis
-from casadi import SX, MX, mtimes, Function, vertcat
+from spline import BSpline, BSplineBasis, csr_matrix_alt, horizon_cache
+from cache import array_key
+from casadi import SX, MX, DM, mtimes, Function, vertcat, densify, if_else
+from scipy.sparse import csc_matrix, block_diag, identity
+from scipy.linalg import solve_triangular
 from scipy.interpolate import splev
 import numpy as np
 
 
+def basis_weights(basis, x):
+    # Evaluate the basis functions in a (symbolic) scalar x, as a row vector.
+    # On every knot interval, the basis functions are polynomials of x: the
+    # weights are the sum of these pieces, each masked with an indicator of
+    # its interval. Unlike a conditional (Switch) node, this can be expanded.
+    if not isinstance(x, (MX, SX)):
+        return DM(basis(x).toarray())
+    breaks, pieces = _polynomial_pieces(basis)
+    zero = type(x).zeros(1, len(basis))
+    weights = zero
+    for j, P in enumerate(pieces):
+        u = (x - breaks[j])/(breaks[j+1] - breaks[j])
+        powers = [type(x)(1.)]
+        for m in range(basis.degree):
+            powers.append(powers[-1]*u)
+        piece = densify(mtimes(vertcat(*powers).T, DM(P)))
+        # intervals are closed on the right, the first one also on the left
+        left = (x >= breaks[j]) if j == 0 else (x > breaks[j])
+        weights += if_else(left*(x <= breaks[j+1]), piece, zero, False)
+    return weights
+
+
+def _polynomial_pieces(basis):
+    # coefficients P[j] of the basis functions on knot interval j:
+    # basis(x) = [1, u, .., u^degree] P[j], u = (x - breaks[j])/(interval width)
+    d = basis.degree
+    breaks = np.unique(basis.knots)
+    u = (np.arange(d+1) + 0.5)/(d+1)
+    x = (breaks[:-1, None] + np.diff(breaks)[:, None]*u).ravel()
+    values = basis(x).toarray().reshape(len(breaks)-1, d+1, len(basis))
+    V = np.vander(u, d+1, increasing=True)
+    pieces = []
+    for j in range(len(breaks)-1):
+        P = np.linalg.solve(V, values[j])
+        P[abs(P) < 1e-12] = 0.
+        pieces.append(csc_matrix(P))
+    return breaks, pieces
+
+
+def _spline_coeffs(s):
+    if isinstance(s.coeffs, (MX, SX)):
+        return s.coeffs
+    if isinstance(s.coeffs, list):
+        return vertcat(*s.coeffs)
+    return np.array(s.coeffs, dtype=float).reshape(-1, 1)
+
+
 def evalspline(s, x):
     # Evaluate spline with symbolic variable
-    # This is possible not the best way to implement this. The conditional node
-    # from casadi should be considered
-    Bl = s.basis
-    coeffs = s.coeffs
-    k = Bl.knots
-    basis = [[]]
-    for i in range(len(k) - 1):
-        if i < Bl.degree + 1 and Bl.knots[0] == Bl.knots[i]:
-            basis[-1].append((x >= Bl.knots[i])*(x <= Bl.knots[i + 1]))
-        else:
-            basis[-1].append((x > Bl.knots[i])*(x <= Bl.knots[i + 1]))
-    for d in range(1, Bl.degree + 1):
-        basis.append([])
-        for i in range(len(k) - d - 1):
-            b = 0 * x
-            bottom = k[i + d] - k[i]
-            if bottom != 0:
-                b = (x - k[i]) * basis[d - 1][i] / bottom
-            bottom = k[i + d + 1] - k[i + 1]
-            if bottom != 0:
-                b += (k[i + d + 1] - x) * basis[d - 1][i + 1] / bottom
-            basis[-1].append(b)
-    result = 0.
-    for l in range(len(Bl)):
-        result += mtimes(coeffs[l], basis[-1][l])
-    return result
+    return mtimes(basis_weights(s.basis, x), _spline_coeffs(s))
 
 
-def running_integral(spline):
-    # Compute running integral from spline
-    basis = spline.basis
-    coeffs = spline.coeffs
+def running_integral_T(basis):
+    # Basis of the running integral and transformation T from the spline
+    # coefficients to the coefficients of its running integral
     knots = basis.knots
     degree = basis.degree
-
     knots_int = np.r_[knots[0], knots, knots[-1]]
     degree_int = degree + 1
     basis_int = BSplineBasis(knots_int, degree_int)
-    coeffs_int = [0.]
-    for i in range(len(basis_int)-1):
-        coeffs_int.append(coeffs_int[i]+(knots[degree+i+1]-knots[i])/float(degree_int)*coeffs[i])
+    widths = (knots[degree+1:] - knots[:-(degree+1)])/float(degree_int)
+    T = np.tril(np.ones((len(basis_int), len(basis))), -1)*widths
+    return basis_int, T
+
+
+def running_integral(spline):
+    # Compute running integral from spline
+    basis_int, T = running_integral_T(spline.basis)
+    coeffs = spline.coeffs
     if isinstance(coeffs, (MX, SX)):
-        coeffs_int = vertcat(*coeffs_int)
+        coeffs_int = mtimes(T, coeffs)
     else:
-        coeffs_int = np.array(coeffs_int)
+        coeffs_int = T.dot(np.array(coeffs))
     spline_int = BSpline(basis_int, coeffs_int)
     return spline_int
 
 
 def definite_integral(spline, a, b):
-    # Compute definite integral of spline in interval [a, b]
-    spline_int = running_integral(spline)
-    int_0a = evalspline(spline_int, a)
-    int_0b = evalspline(spline_int, b)
-    int_ab = int_0b - int_0a
-    return int_ab
+    # Compute definite integral of spline in interval [a, b]: the integral
+    # weights are the running integral basis in b minus in a
+    basis_int, T = running_integral_T(spline.basis)
+    weights = basis_weights(basis_int, b) - basis_weights(basis_int, a)
+    return mtimes(mtimes(weights, T), _spline_coeffs(spline))
+
+
+def _cached(name, basis, args, create):
+    # transformations only depend on the knots and degree of the basis, and
+    # are shared between all bases (and callers) that are equal
+    key = (name, basis.degree, array_key(basis.knots)) + tuple(args)
+    return horizon_cache.get_or_create(key, create)
 
 
 def shift_spline(coeffs, t_shift, basis):
@@ -105,6 +140,11 @@ def extrapolate(coeffs, t_extra, basis):
 def extrapolate_T(basis, t_extra):
     # Create transformation matrix that extrapolates the spline over an extra
     # knot interval of t_extra long.
+    return _cached('extrapolate', basis, [float(t_extra)],
+                   lambda: csr_matrix_alt(_extrapolate_T(basis, t_extra)))
+
+
+def _extrapolate_T(basis, t_extra):
     knots = basis.knots
     deg = basis.degree
     N = len(basis)
@@ -164,6 +204,11 @@ def shiftoverknot_T(basis):
     # Create transformation matrix that moves the horizon to
     # [knot[degree+1], T+knots[-1]-knots[-deg-2]]. The spline is extrapolated
     # over the last knot interval.
+    return _cached('shiftoverknot', basis, [],
+                   lambda: csr_matrix_alt(_shiftoverknot_T(basis)))
+
+
+def _shiftoverknot_T(basis):
     knots = basis.knots
     deg = basis.degree
     m = 1  # number of repeating internal knots
@@ -184,18 +229,20 @@ def shiftoverknot_T(basis):
                 _t[j, j] = (t_shift-knots[j])/(knots[j+deg-k]-knots[j])
         _T = _t.dot(_T)
     T[:deg, :deg+1] = _T[deg+1:, :]
-    T_extr = extrapolate_T(basis, knots[-1] - knots[-deg-2])
+    T_extr = _extrapolate_T(basis, knots[-1] - knots[-deg-2])
     T[-(deg+1):, -(deg+1):] = T_extr[-(deg+1):, -(deg+1):]
     return T
 
 
 def shift_knot1_fwd(cfs, basis, t_shift):
     if isinstance(cfs, (SX, MX)):
-        cfs_sym = MX.sym('cfs', cfs.shape)
-        t_shift_sym = MX.sym('t_shift')
-        T = shiftfirstknot_T(basis, t_shift_sym)
-        cfs2_sym = mtimes(T, cfs_sym)
-        fun = Function('fun', [cfs_sym, t_shift_sym], [cfs2_sym]).expand()
+        def create():
+            cfs_sym = MX.sym('cfs', cfs.shape)
+            t_shift_sym = MX.sym('t_shift')
+            T = shiftfirstknot_T(basis, t_shift_sym)
+            cfs2_sym = mtimes(T, cfs_sym)
+            return Function('fun', [cfs_sym, t_shift_sym], [cfs2_sym]).expand()
+        fun = _cached('shift_knot1_fwd', basis, [cfs.shape], create)
         return fun(cfs, t_shift)
     else:
         T = shiftfirstknot_T(basis, t_shift)
@@ -204,11 +251,13 @@ def shift_knot1_fwd(cfs, basis, t_shift):
 
 def shift_knot1_bwd(cfs, basis, t_shift):
     if isinstance(cfs, (SX, MX)):
-        cfs_sym = SX.sym('cfs', cfs.shape)
-        t_shift_sym = SX.sym('t_shift')
-        _, Tinv = shiftfirstknot_T(basis, t_shift_sym, inverse=True)
-        cfs2_sym = mtimes(Tinv, cfs_sym)
-        fun = Function('fun', [cfs_sym, t_shift_sym], [cfs2_sym]).expand()
+        def create():
+            cfs_sym = SX.sym('cfs', cfs.shape)
+            t_shift_sym = SX.sym('t_shift')
+            _, Tinv = shiftfirstknot_T(basis, t_shift_sym, inverse=True)
+            cfs2_sym = mtimes(Tinv, cfs_sym)
+            return Function('fun', [cfs_sym, t_shift_sym], [cfs2_sym]).expand()
+        fun = _cached('shift_knot1_bwd', basis, [cfs.shape], create)
         return fun(cfs, t_shift)
     else:
         _, Tinv = shiftfirstknot_T(basis, t_shift, inverse=True)
@@ -218,7 +267,52 @@ def shift_knot1_bwd(cfs, basis, t_shift):
 def shiftfirstknot_T(basis, t_shift, inverse=False):
     # Create transformation matrix that shifts the first (degree+1) knots over
     # t_shift. With inverse = True, the inverse transformation is also
-    # computed.
+    # computed. Numeric transformations are sparse.
+    if isinstance(t_shift, (SX, MX)):
+        return _shiftfirstknot_T(basis, t_shift, inverse)
+    deg, N = basis.degree, len(basis)
+    # only the factors are cached, as t_shift differs for every call
+    factors = _cached('shiftfirstknot', basis, [],
+                      lambda: _shiftfirstknot_factors(basis))
+    _T = np.eye(deg+1)
+    for P, Q in factors:
+        _T = (P + t_shift*Q).dot(_T)
+    _T = _T[deg+1:, :]
+    T = _embed_block(_T, N)
+    if inverse:  # _T is upper triangular: easy inverse
+        return T, _embed_block(solve_triangular(_T, np.eye(deg+1)), N)
+    return T
+
+
+def _shiftfirstknot_factors(basis):
+    # the shift of the first knots is a product of factors P + t_shift*Q
+    knots, deg = basis.knots, basis.degree
+    factors = []
+    for k in range(deg+1):
+        P = np.zeros((deg+1+k+1, deg+1+k))
+        Q = np.zeros((deg+1+k+1, deg+1+k))
+        for j in range(deg+1+k+1):
+            if j >= deg+1:
+                P[j, j-1] = 1.
+            elif j <= k:
+                P[j, j] = 1.
+            else:
+                den = knots[j+deg-k]-knots[j]
+                P[j, j-1], Q[j, j-1] = knots[j+deg-k]/den, -1./den
+                P[j, j], Q[j, j] = -knots[j]/den, 1./den
+        factors.append((P, Q))
+    return factors
+
+
+def _embed_block(block, N):
+    # identity of size N with block in its upper left corner
+    n = block.shape[0]
+    if n == N:
+        return csr_matrix_alt(block)
+    return csr_matrix_alt(block_diag([block, identity(N-n)], format='csr'))
+
+
+def _shiftfirstknot_T(basis, t_shift, inverse):
     knots, deg = basis.knots, basis.degree
     N = len(basis)
     if isinstance(t_shift, SX):
@@ -255,6 +349,12 @@ def shiftfirstknot_T(basis, t_shift, inverse=False):
 
 def knot_insertion_T(basis, knots_to_insert):
     # Create transformation matrix that transforms spline after inserting knots
+    T, knots = _cached('knot_insertion', basis, [array_key(knots_to_insert)],
+                       lambda: _knot_insertion_T(basis, knots_to_insert))
+    return T, list(knots)
+
+
+def _knot_insertion_T(basis, knots_to_insert):
     N = len(basis)
     knots = basis.knots.tolist()
     degree = basis.degree
@@ -275,7 +375,7 @@ def knot_insertion_T(basis, knots_to_insert):
         T = _T.dot(T)
         N += 1
         knots = sorted(knots + [knot])
-    return T, knots
+    return csr_matrix_alt(T), knots
 
 
 def get_interval_T(basis, min_value, max_value):
@@ -290,7 +390,7 @@ def get_interval_T(basis, min_value, max_value):
     T, knots2 = knot_insertion_T(basis, min_knots+max_knots)
     jmin = np.searchsorted(knots2, min_value, side='left')
     jmax = np.searchsorted(knots2, max_value, side='right')
-    return T[jmin:jmax-degree-1, :], knots2[jmin:jmax]
+    return T.toarray()[jmin:jmax-degree-1, :], knots2[jmin:jmax]
 
 
 def crop_spline(spline, min_value, max_value):
@@ -328,36 +428,31 @@ def sample_splines(spline, time):
         return splev(time, (spline.basis.knots, spline.coeffs, spline.basis.degree))
 
 
-# def integral_sqbasis(basis):
-#     # Compute integral of squared bases.
-#     basis_prod = basis*basis
-#     pairs, _ = basis.pairs(basis)
-#     b_self = basis(basis_prod._x)
-#     basis_product = b_self[:, pairs[0]].multiply(b_self[:, pairs[1]])
-#     T = basis_prod.transform(lambda y: basis_product.toarray()[y, :])
-
-#     knots = basis_prod.knots
-#     d = basis_prod.degree
-#     K = np.array((knots[d + 1:] - knots[:-(d + 1)]) / (d + 1))
-
-#     L = len(basis)
-#     B = np.zeros((L, L))
-#     degree = basis.degree
-#     k = 0
-#     for i in range(L):
-#         c1 = np.zeros(L)
-#         c1[i] = 1
-#         for j in range(i, i+degree+1-k):
-#             c2 = np.zeros(L)
-#             c2[j] = 1
-#             coeffs_product = (c1[pairs[0].tolist()]*c2[pairs[1].tolist()])
-#             c_prod = T.dot(coeffs_product)
-#             bb = K.T.dot(c_prod)
-#             B[i, j] = bb
-#             B[j, i] = bb
-#         if i >= L-degree-1:
-#             k += 1
-#     return B
+def integral_sqbasis(basis):
+    # Compute integral of squared bases: B[i, j] = int(b_i*b_j). The products
+    # are polynomials of degree 2*degree on every knot interval, so
+    # Gauss-Legendre quadrature with degree+1 nodes per interval is exact.
+    knots = np.unique(basis.knots)
+    nodes, weights = np.polynomial.legendre.leggauss(basis.degree+1)
+    half = 0.5*(knots[1:] - knots[:-1])
+    x = np.ravel(np.outer(half, nodes + 1.) + knots[:-1, None])
+    w = np.ravel(np.outer(half, weights))
+    b = basis(x).toarray()
+    return b.T.dot(w[:, None]*b)
+
+
+def shiftoverknot_dual_T(basis):
+    # Transformation of the multipliers of a spline constraint when its
+    # coefficients are shifted over a knot: the multipliers are integrals of
+    # a multiplier spline against the basis, so they transform with
+    # B*T*B^-1, with B the integral of the squared bases.
+    def create():
+        B = integral_sqbasis(basis)
+        T = shiftoverknot_T(basis).toarray()
+        T_dual = np.linalg.solve(B.T, B.dot(T).T).T
+        T_dual.flags.writeable = False
+        return T_dual
+    return _cached('shiftoverknot_dual', basis, [], create)
 
 
 # def definite_integral_sqbasisMX(basis, a, b):
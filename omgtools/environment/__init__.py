@@ -1,2 +1,2 @@
 from environment import Environment
-from obstacle import Obstacle
+from obstacle import Obstacle, ObstacleSlot
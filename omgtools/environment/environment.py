@@ -19,15 +19,17 @@
 
 from ..basics.optilayer import OptiChild
 from ..basics.spline import BSplineBasis
+from ..basics.profiler import profile_child
 from ..execution.plotlayer import PlotLayer, mix_with_white
-from obstacle import Obstacle
+from obstacle import Obstacle, ObstacleSlot
+from ..basics.shape import Rectangle, Square
 from casadi import inf
 import numpy as np
 
 
 class Environment(OptiChild, PlotLayer):
 
-    def __init__(self, room, obstacles=None):
+    def __init__(self, room, obstacles=None, room_parameter=False):
         obstacles = obstacles or []
         OptiChild.__init__(self, 'environment')
         PlotLayer.__init__(self)
@@ -46,6 +48,12 @@ class Environment(OptiChild, PlotLayer):
                                  + str(self.n_dim) + ', which is invalid.')
         if 'draw' not in room:
             self.room['draw'] = False
+        # room limits as parameter, such that the room can move or resize
+        # without rebuilding the problem
+        self.room_parameter = room_parameter
+        if room_parameter and not self._axis_aligned_box(self.room):
+            raise ValueError('Only an axis-aligned rectangular room can ' +
+                             'be used as parameter.')
 
         # add obstacles
         self.obstacles, self.n_obs = [], 0
@@ -59,7 +67,7 @@ class Environment(OptiChild, PlotLayer):
     def copy(self):
         obstacles = [Obstacle(o.initial, o.shape, o.simulation, o.options)
                      for o in self.obstacles]
-        return Environment(self.room, obstacles)
+        return Environment(self.room, obstacles, self.room_parameter)
 
     # ========================================================================
     # Add obstacles/vehicles
@@ -77,6 +85,40 @@ class Environment(OptiChild, PlotLayer):
             self.obstacles.append(obstacle)
             self.n_obs += 1
 
+    def add_obstacle_slots(self, number, n_chck=4):
+        slots = [ObstacleSlot(n_chck) for _ in range(number)]
+        self.add_obstacle(slots)
+        return slots
+
+    def fill_obstacle_slots(self, obstacles):
+        # bind obstacles to the slots of this environment, release the
+        # remaining slots. Returns False if the obstacles do not fit.
+        slots = [obs for obs in self.obstacles if isinstance(obs, ObstacleSlot)]
+        if len(obstacles) > len(slots):
+            return False
+        if not all([slot.fits(obs) for slot, obs in zip(slots, obstacles)]):
+            return False
+        for k, slot in enumerate(slots):
+            if k < len(obstacles):
+                slot.bind(obstacles[k])
+            else:
+                slot.release()
+        return True
+
+    def set_room(self, room):
+        if not self.room_parameter:
+            raise ValueError('The room can only be changed when it is a parameter.')
+        if not self._axis_aligned_box(room) or room['shape'].n_dim != self.n_dim:
+            raise ValueError('Only an axis-aligned rectangular room can ' +
+                             'be used as parameter.')
+        self.room['shape'] = room['shape']
+        self.room['position'] = room['position']
+
+    def _axis_aligned_box(self, room):
+        return (isinstance(room['shape'], (Rectangle, Square)) and
+                room['shape'].orientation == 0. and
+                ('orientation' not in room or room['orientation'] == 0.))
+
     def define_collision_constraints(self, vehicle, splines):
         if vehicle.n_dim != self.n_dim:
             raise ValueError('Not possible to combine ' +
@@ -101,8 +143,11 @@ class Environment(OptiChild, PlotLayer):
                         'b'+'_'+vehicle.label+'_'+str(k)+str(l), 1, basis=basis)[0]
                     self.define_constraint(
                         sum([a[p]*a[p] for p in range(self.n_dim)])-1, -inf, 0.)
-                    hyp_veh[shape].append({'a': a, 'b': b})
-                    hyp_obs[obstacle].append({'a': a, 'b': b})
+                    hyperplane = {'a': a, 'b': b}
+                    if isinstance(obstacle, ObstacleSlot):
+                        hyperplane['relax'] = obstacle.relaxation
+                    hyp_veh[shape].append(hyperplane)
+                    hyp_obs[obstacle].append(hyperplane)
         for obstacle in self.obstacles:
             if obstacle.options['avoid']:
                 obstacle.define_collision_constraints(hyp_obs[obstacle])
@@ -140,9 +185,34 @@ class Environment(OptiChild, PlotLayer):
     # Optimization modelling related functions
     # ========================================================================
 
-    def init(self):
+    def init(self, profiler=None):
+        if self.room_parameter:
+            self.room_lim = self.define_parameter('room_lim', 2*self.n_dim)
         for obstacle in self.obstacles:
-            obstacle.init()
+            with profile_child(profiler, obstacle.label):
+                obstacle.init()
+
+    def set_parameters(self, current_time):
+        parameters = {self: {}}
+        if self.room_parameter:
+            parameters[self]['room_lim'] = np.hstack(self.get_canvas_limits())
+        return parameters
+
+    def get_room_limits(self):
+        if self.room_parameter:
+            return [[self.room_lim[2*k], self.room_lim[2*k+1]] for k in range(self.n_dim)]
+        return self.get_canvas_limits()
+
+    def get_room_hyperplanes(self):
+        if self.room_parameter:
+            hyperplanes = {}
+            for k, (lower, upper) in enumerate(self.get_room_limits()):
+                normal = np.zeros(self.n_dim)
+                normal[k] = 1.
+                hyperplanes[2*k] = {'a': -normal, 'b': -lower}
+                hyperplanes[2*k+1] = {'a': normal, 'b': upper}
+            return hyperplanes
+        return self.room['shape'].get_hyperplanes(position=self.room['position'])
 
     # ========================================================================
     # Simulate environment
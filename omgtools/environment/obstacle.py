@@ -83,7 +83,7 @@ class ObstaclexD(OptiChild):
         self.pos_spline = [BSpline(self.basis, vertcat(x0[k], 0.5*v0[k]*self.T + x0[k], x0[k] + v0[k]*self.T + 0.5*a0[k]*(self.T**2)))
                            for k in range(self.n_dim)]
         # checkpoints + radii
-        checkpoints, _ = self.shape.get_checkpoints()
+        checkpoints, _ = self.get_checkpoints()
         self.checkpoints = self.define_parameter('checkpoints', len(checkpoints)*self.n_dim)
         self.rad = self.define_parameter('rad', len(checkpoints))
 
@@ -95,11 +95,14 @@ class ObstaclexD(OptiChild):
         parameters[self]['x'] = self.signals['position'][:, -1]
         parameters[self]['v'] = self.signals['velocity'][:, -1]
         parameters[self]['a'] = self.signals['acceleration'][:, -1]
-        checkpoints, rad = self.shape.get_checkpoints()
+        checkpoints, rad = self.get_checkpoints()
         parameters[self]['checkpoints'] = np.reshape(checkpoints, (len(checkpoints)*self.n_dim, ))
         parameters[self]['rad'] = rad
         return parameters
 
+    def get_checkpoints(self):
+        return self.shape.get_checkpoints()
+
     # ========================================================================
     # Deploying related functions
     # ========================================================================
@@ -277,13 +280,14 @@ class Obstacle2D(ObstaclexD):
     def define_collision_constraints(self, hyperplanes):
         for hyperplane in hyperplanes:
             a, b = hyperplane['a'], hyperplane['b']
+            relax = 0. if 'relax' not in hyperplane else hyperplane['relax']
             for l in range(self.checkpoints.shape[0]/self.n_dim):
                 xpos = self.pos_spline[
                     0]*self.gon_weight + self.checkpoints[l*self.n_dim+0]*self.cos - self.checkpoints[l*self.n_dim+1]*self.sin
                 ypos = self.pos_spline[
                     1]*self.gon_weight + self.checkpoints[l*self.n_dim+0]*self.sin + self.checkpoints[l*self.n_dim+1]*self.cos
                 self.define_constraint(-(a[0]*xpos + a[1] *
-                                         ypos) + self.gon_weight*(b+self.rad[l]), -inf, 0.)
+                                         ypos) + self.gon_weight*(b+self.rad[l]) - relax, -inf, 0.)
 
     def set_parameters(self, current_time):
         parameters = ObstaclexD.set_parameters(self, current_time)
@@ -469,6 +473,81 @@ class Obstacle2D(ObstaclexD):
         return self.shape.draw(pose)
 
 
+class ObstacleSlot(Obstacle2D):
+    # Placeholder for an obstacle whose position, shape and presence are all
+    # parameters. A problem built with slots can be reused for any set of
+    # obstacles that fits in them: bind an obstacle to a slot to avoid it and
+    # release the slot to deactivate its constraints.
+
+    def __init__(self, n_chck=4, options=None):
+        self.n_chck = n_chck
+        self.obstacle = None
+        Obstacle2D.__init__(self, {}, Circle(0.), {}, options or {})
+
+    def set_default_options(self):
+        Obstacle2D.set_default_options(self)
+        self.options['draw'] = False
+        # relaxes the collision constraints of an empty slot (big-M)
+        self.options['relaxation'] = 1e3
+
+    # ========================================================================
+    # Optimization modelling related functions
+    # ========================================================================
+
+    def init(self):
+        Obstacle2D.init(self)
+        self.active = self.define_parameter('active', 1)
+        self.relaxation = self.options['relaxation']*(1.-self.active)
+
+    def set_parameters(self, current_time):
+        parameters = {self: {}}
+        source = self if self.obstacle is None else self.obstacle
+        parameters[self]['x'] = source.signals['position'][:, -1]
+        parameters[self]['v'] = source.signals['velocity'][:, -1]
+        parameters[self]['a'] = source.signals['acceleration'][:, -1]
+        checkpoints, rad = self.get_checkpoints()
+        parameters[self]['checkpoints'] = np.reshape(checkpoints, (self.n_chck*self.n_dim, ))
+        parameters[self]['rad'] = rad
+        parameters[self]['active'] = 0. if self.obstacle is None else 1.
+        return parameters
+
+    def get_checkpoints(self):
+        if self.obstacle is None:
+            return [[0., 0.] for _ in range(self.n_chck)], [0. for _ in range(self.n_chck)]
+        checkpoints, rad = self.obstacle.shape.get_checkpoints()
+        # a slot does not rotate: express checkpoints in the world frame
+        theta = self.obstacle.signals['orientation'][:, -1][0]
+        rot = np.array([[np.cos(theta), -np.sin(theta)],
+                        [np.sin(theta), np.cos(theta)]])
+        checkpoints = [rot.dot(chck).tolist() for chck in checkpoints]
+        rad = list(rad)
+        # fill remaining checkpoints with copies of the last one
+        checkpoints += [checkpoints[-1] for _ in range(self.n_chck-len(checkpoints))]
+        rad += [rad[-1] for _ in range(self.n_chck-len(rad))]
+        return checkpoints, rad
+
+    # ========================================================================
+    # Slot assignment
+    # ========================================================================
+
+    def fits(self, obstacle):
+        if obstacle.n_dim != 2 or obstacle.signals['angular_velocity'][:, -1][0] != 0.:
+            return False
+        return len(obstacle.shape.get_checkpoints()[0]) <= self.n_chck
+
+    def bind(self, obstacle):
+        if not self.fits(obstacle):
+            raise ValueError('Only non-rotating 2D obstacles with at most ' +
+                             str(self.n_chck) + ' checkpoints fit in this slot.')
+        self.obstacle = obstacle
+
+    def release(self):
+        self.obstacle = None
+
+    def draw(self, t=-1):
+        return [], []
+
+
 class Obstacle3D(ObstaclexD):
 
     def __init__(self, initial, shape, simulation, options):
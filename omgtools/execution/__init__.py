@@ -1,3 +1,5 @@
 from plotlayer import PlotLayer
-from deployer import Deployer
+from deployer import Deployer, AsyncDeployer
 from simulator import Simulator
+from telemetry import SolverTelemetry
+from benchmark import SolverBenchmark, get_available_solvers
@@ -0,0 +1,210 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from simulator import Simulator
+from casadi import MX, nlpsol
+import collections as col
+import numpy as np
+import json
+import time
+
+# vehicle types of the scenario matrix: class name, keyword arguments,
+# initial and terminal conditions
+_vehicles = col.OrderedDict([
+    ('holonomic', ('Holonomic', {}, [-2., -2.], [2., 2.])),
+    ('dubins', ('Dubins', {}, [-2., -2., 0.], [2., 2., 0.])),
+    ('bicycle', ('Bicycle', {'length': 0.4}, [-2., -2., 0., 0.],
+                 [2., 2., 0.]))])
+
+# obstacles are taken in this order, the first one blocks the straight line
+_obstacle_positions = [[0., 0.], [-1., 0.8], [1., -0.8], [0.9, 1.3]]
+
+# candidate solver settings, only the available ones are benchmarked
+_solvers = col.OrderedDict([
+    ('ipopt_mumps', ('ipopt', {'ipopt.linear_solver': 'mumps'})),
+    ('ipopt_ma27', ('ipopt', {'ipopt.linear_solver': 'ma27'})),
+    ('ipopt_ma57', ('ipopt', {'ipopt.linear_solver': 'ma57'})),
+    ('worhp', ('worhp', {'worhp.MaxIter': 200, 'worhp.TolOpti': 1e-6,
+                         'worhp.InitialLMest': False, 'worhp.UserHM': True})),
+    ('snopt', ('snopt', {'snopt.Hessian': 'limited memory',
+                         'start': 'warm'})),
+    ('blocksqp', ('blocksqp', {'warmstart': True, 'hess_lim_mem': 0})),
+    ('knitro', ('knitro', {'knitro.bar_initpt': 2, 'knitro.honorbnds': 0,
+                           'knitro.scale': 1}))])
+
+_quiet_options = {'ipopt': {'ipopt.print_level': 0, 'print_time': 0}}
+
+
+def get_available_solvers(solvers=None):
+    # solver settings that solve a small test problem, as
+    # {name: (solver, solver options)}
+    solvers = _solvers if solvers is None else solvers
+    x = MX.sym('x', 2)
+    nlp = {'x': x, 'f': (x[0]-1.)**2 + (x[1]-2.)**2, 'g': x[0]+x[1]}
+    available = col.OrderedDict()
+    for name, (solver, options) in solvers.items():
+        options = dict(options, **_quiet_options.get(solver, {}))
+        try:
+            test = nlpsol('test_'+name, solver, nlp, options)
+            test(x0=[0., 0.], lbg=-1., ubg=1.)
+            status = test.stats().get('return_status', 'Solve_Succeeded')
+        except Exception:
+            continue
+        if status in ['Solve_Succeeded', 'Solved_To_Acceptable_Level']:
+            available[name] = (solver, options)
+    return available
+
+
+def _to_builtin(value):
+    # json does not know numpy types, nan becomes null
+    if isinstance(value, dict):
+        return col.OrderedDict([(k, _to_builtin(v)) for k, v in value.items()])
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_to_builtin(v) for v in value]
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+class SolverBenchmark(object):
+    # Runs a point-to-point scenario matrix (vehicle type x number of
+    # obstacles x free/fixed T) with every available solver setting and
+    # collects build time, update time distribution, iterations and final
+    # objective in a report that can be stored as json.
+
+    def __init__(self, vehicles=None, n_obstacles=None, freeT=None,
+                 solvers=None, options=None):
+        self.vehicles = vehicles or _vehicles.keys()
+        self.n_obstacles = n_obstacles or [0, 1, 3]
+        self.freeT = freeT or [False, True]
+        for vehicle in self.vehicles:
+            if vehicle not in _vehicles:
+                raise ValueError('Unknown vehicle type ' + vehicle + '. ' +
+                                 'Choose between ' + ', '.join(_vehicles) + '.')
+        if max(self.n_obstacles) > len(_obstacle_positions):
+            raise ValueError('At most %d obstacles are supported.' %
+                             len(_obstacle_positions))
+        if solvers is not None and not isinstance(solvers, dict):
+            solvers = col.OrderedDict([(name, _solvers[name]) for name in solvers])
+        self.solvers = get_available_solvers(solvers)
+        self.options = {'max_updates': 500, 'update_time': 0.1,
+                        'sample_time': 0.01, 'percentiles': (50, 90, 99),
+                        'verbose': 1}
+        if options is not None:
+            self.options.update(options)
+        self.results = []
+
+    def get_scenarios(self):
+        return [{'vehicle': vehicle, 'n_obstacles': n_obst, 'freeT': freeT}
+                for vehicle in self.vehicles for n_obst in self.n_obstacles
+                for freeT in self.freeT]
+
+    def create_problem(self, scenario, solver, solver_options):
+        # local imports required to avoid circular dependency
+        from .. import vehicles
+        from ..environment import Environment, Obstacle
+        from ..basics.shape import Square, Circle
+        from ..problems.point2point import Point2point
+        cls, kwargs, initial, terminal = _vehicles[scenario['vehicle']]
+        vehicle = getattr(vehicles, cls)(**kwargs)
+        vehicle.set_options({'safety_distance': 0.1})
+        vehicle.set_initial_conditions(initial)
+        vehicle.set_terminal_conditions(terminal)
+        environment = Environment(room={'shape': Square(6.)})
+        for position in _obstacle_positions[:scenario['n_obstacles']]:
+            environment.add_obstacle(Obstacle({'position': position},
+                                              shape=Circle(0.3)))
+        problem = Point2point(vehicle, environment, freeT=scenario['freeT'])
+        problem.set_options({'solver': solver, 'verbose': 0,
+                             'solver_options': {solver: solver_options}})
+        return problem
+
+    def run_scenario(self, scenario, name):
+        solver, solver_options = self.solvers[name]
+        result = col.OrderedDict([('solver', name)])
+        result.update(scenario)
+        try:
+            problem = self.create_problem(scenario, solver, solver_options)
+            result['build_time'] = problem.init()
+            simulator = Simulator(problem, self.options['sample_time'],
+                                  self.options['update_time'])
+            simulator.deployer.reset()
+            t0 = time.time()
+            reached = False
+            for _ in range(self.options['max_updates']):
+                reached = simulator.update()
+                simulator.update_timing()
+                if reached:
+                    break
+            result['run_time'] = time.time() - t0
+            result['reached'] = bool(reached)
+            result['n_updates'] = len(problem.update_times)
+            summary = problem.get_telemetry(self.options['percentiles'])
+            result['update_time'] = summary['update_time']
+            result['iterations'] = summary['iterations']
+            result['status'] = summary['status']
+        except Exception as error:
+            result['error'] = str(error)
+            return result
+        try:
+            result['objective'] = float(problem.compute_objective())
+        except Exception:
+            # no objective for a run that did not get far enough
+            result['objective'] = np.nan
+        result['error'] = None
+        return result
+
+    def run(self):
+        self.results = []
+        for scenario in self.get_scenarios():
+            for name in self.solvers:
+                if self.options['verbose'] >= 1:
+                    print 'Running %s with %d obstacle(s), %s T, using %s' % (
+                        scenario['vehicle'], scenario['n_obstacles'],
+                        'free' if scenario['freeT'] else 'fixed', name)
+                self.results.append(self.run_scenario(scenario, name))
+        return self.get_report()
+
+    def get_report(self):
+        return _to_builtin({'scenarios': self.get_scenarios(),
+                            'solvers': self.solvers.keys(),
+                            'results': self.results})
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.get_report(), f, indent=2)
+
+    def print_summary(self):
+        print '%-12s %-10s %5s %5s %9s %9s %9s %6s %10s' % (
+            'solver', 'vehicle', 'obst', 'T', 'build (s)', 'p50 (ms)',
+            'max (ms)', 'iter', 'objective')
+        for res in self.results:
+            T = 'free' if res['freeT'] else 'fixed'
+            if res['error'] is not None:
+                print '%-12s %-10s %5d %5s  failed: %s' % (
+                    res['solver'], res['vehicle'], res['n_obstacles'], T,
+                    res['error'])
+                continue
+            print '%-12s %-10s %5d %5s %9.3f %9.2f %9.2f %6.1f %10.4g' % (
+                res['solver'], res['vehicle'], res['n_obstacles'], T,
+                res['build_time'], res['update_time']['p50']*1e3,
+                res['update_time']['max']*1e3, res['iterations']['mean'],
+                res['objective'])
@@ -18,6 +18,8 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
 import numpy as np
+import threading
+import time
 from plotlayer import PlotLayer
 
 
@@ -74,3 +76,150 @@ class Deployer:
             for vehicle in self.problem.vehicles:
                 trajectories[str(vehicle)] = vehicle.trajectories
         return trajectories
+
+
+class AsyncDeployer(Deployer):
+    # Runs predict, solve and store on a worker thread, while the caller keeps
+    # executing the last published trajectories. A new plan replaces the
+    # published one when its solve finishes within the deadline (default:
+    # the update time). A late plan is dropped and counted as a deadline
+    # miss: the published plan, shifted to the current time, is kept and the
+    # next update starts from it. Only copies of the plans are handed out,
+    # such that the caller never reads the state the worker changes.
+
+    def __init__(self, problem, sample_time=0.01, update_time=0.1,
+                 deadline=None):
+        Deployer.__init__(self, problem, sample_time, update_time)
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._worker = None
+        self._trajectories = None
+        self._published = None
+        self._error = None
+        self.reset_statistics()
+
+    def reset(self):
+        self.wait()
+        self._trajectories = None
+        self._published = None
+        Deployer.reset(self)
+
+    def reset_statistics(self):
+        self.latencies = []
+        self.n_updates = 0
+        self.n_deadline_misses = 0
+
+    def update(self, current_time, states=None, update_time=None):
+        current_time = float(current_time)
+        if not update_time:
+            update_time = self.update_time
+        deadline = self.deadline if self.deadline is not None else update_time
+        self.n_updates += 1
+        if self._worker is not None and self._worker.is_alive():
+            return self.get_trajectories(current_time)
+        self._check_error()
+        self._worker = threading.Thread(
+            target=self._solve,
+            args=(current_time, states, update_time, deadline))
+        self._worker.daemon = True
+        self._worker.start()
+        if self._trajectories is None:
+            # nothing to execute yet: the first plan is awaited
+            self.wait()
+        return self.get_trajectories(current_time)
+
+    def _solve(self, current_time, states, update_time, deadline):
+        t_start = time.time()
+        try:
+            trajectories = Deployer.update(self, current_time, states,
+                                           update_time)
+        except Exception as error:
+            self._error = error
+            return
+        t_end = time.time()
+        # the deadline is checked when the plan is finished, such that
+        # misses do not depend on how often update is called
+        late = t_end - t_start > deadline
+        if late and self._published is not None:
+            # continue from the plan that is executed
+            self._restore(self._published)
+        else:
+            self._published = self._snapshot()
+        with self._lock:
+            self.latencies.append(t_end - t_start)
+            if late:
+                self.n_deadline_misses += 1
+            if not late or self._trajectories is None:
+                # without a published plan, a late one is better than none
+                self._trajectories = _copy_trajectories(trajectories)
+
+    def _snapshot(self):
+        # state of the deployer and vehicles that belongs to a plan
+        vehicles = [dict([(attr, getattr(vehicle, attr)) for attr in
+                          ['trajectories', 'trajectories_kn', 'result_splines']
+                          if hasattr(vehicle, attr)])
+                    for vehicle in self.problem.vehicles]
+        return self.current_time, vehicles
+
+    def _restore(self, snapshot):
+        self.current_time, vehicles = snapshot
+        for vehicle, attributes in zip(self.problem.vehicles, vehicles):
+            for attr, value in attributes.items():
+                setattr(vehicle, attr, value)
+
+    def _check_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def wait(self):
+        # block until the running solve is finished
+        if self._worker is not None:
+            self._worker.join()
+        self._check_error()
+
+    def get_trajectories(self, current_time=None):
+        with self._lock:
+            trajectories = self._trajectories
+        if current_time is None or trajectories is None:
+            return trajectories
+        return _shift_trajectories(trajectories, current_time)
+
+    def get_statistics(self):
+        with self._lock:
+            latencies = np.array(self.latencies)
+            n_deadline_misses = self.n_deadline_misses
+        statistics = {'n_updates': self.n_updates,
+                      'n_solves': latencies.size,
+                      'n_deadline_misses': n_deadline_misses}
+        if latencies.size > 0:
+            statistics.update({'latency_mean': np.mean(latencies),
+                               'latency_max': np.max(latencies),
+                               'latency_p99': np.percentile(latencies, 99)})
+        return statistics
+
+
+def _copy_trajectories(trajectories):
+    # the published plan does not share arrays with the problem
+    return dict([(key, _copy_trajectories(value) if isinstance(value, dict)
+                  else np.array(value, copy=True))
+                 for key, value in trajectories.items()])
+
+
+def _shift_trajectories(trajectories, current_time):
+    # drop the samples of a plan that lie before current_time
+    if 'time' not in trajectories:
+        return dict([(key, _shift_trajectories(value, current_time))
+                     for key, value in trajectories.items()])
+    time_axis = trajectories['time'][0, :]
+    n_samp = time_axis.size
+    index = min(np.searchsorted(time_axis, current_time-1e-9), n_samp-1)
+    if index == 0:
+        return trajectories
+    shifted = {}
+    for key, value in trajectories.items():
+        if value.ndim == 2 and value.shape[1] == n_samp:
+            shifted[key] = value[:, index:]
+        else:
+            shifted[key] = value
+    return shifted
@@ -0,0 +1,118 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import collections as col
+import numpy as np
+
+
+SolveRecord = col.namedtuple('SolveRecord', [
+    'update_time', 'iterations', 't_function', 't_gradient', 't_hessian',
+    't_solver', 'status', 'objective'])
+
+# names of the solver statistics differ between casadi versions
+_stat_keys = {
+    'iterations': ['iter_count'],
+    't_total': ['t_mainloop', 't_proc_mainloop', 't_proc_total'],
+    't_function': [['t_eval_f', 't_eval_g'],
+                   ['t_proc_nlp_f', 't_proc_nlp_g']],
+    't_gradient': [['t_eval_grad_f', 't_eval_jac_g'],
+                   ['t_proc_nlp_grad_f', 't_proc_nlp_jac_g']],
+    't_hessian': [['t_eval_h'], ['t_proc_nlp_hess_l']]
+}
+
+
+def _get_stat(stats, name):
+    for keys in _stat_keys[name]:
+        keys = keys if isinstance(keys, list) else [keys]
+        if all([key in stats for key in keys]):
+            return sum([float(stats[key]) for key in keys])
+    return np.nan
+
+
+class SolverTelemetry(object):
+    # Keeps a compact record of the last 'size' solves in a ring buffer.
+    # Time spent in the linear solver and the rest of the solver itself is
+    # what remains of the solver's main loop after the evaluations.
+
+    fields = SolveRecord._fields
+
+    def __init__(self, size=1000):
+        self.size = size
+        self.reset()
+
+    def reset(self):
+        self._records = col.deque(maxlen=self.size)
+        self.n_solves = 0
+
+    def record(self, update_time, stats, objective=np.nan):
+        t_fun = _get_stat(stats, 't_function')
+        t_grad = _get_stat(stats, 't_gradient')
+        t_hess = _get_stat(stats, 't_hessian')
+        t_solver = _get_stat(stats, 't_total') - np.nansum([t_fun, t_grad, t_hess])
+        status = stats['return_status'] if 'return_status' in stats else None
+        record = SolveRecord(float(update_time), _get_stat(stats, 'iterations'),
+                             t_fun, t_grad, t_hess, t_solver, status,
+                             float(objective))
+        self._records.append(record)
+        self.n_solves += 1
+        return record
+
+    def get_records(self):
+        return list(self._records)
+
+    def get_last_record(self):
+        return self._records[-1] if self._records else None
+
+    def get_field(self, field):
+        if field not in self.fields:
+            raise ValueError('Unknown telemetry field ' + field + '.')
+        return [getattr(record, field) for record in self._records]
+
+    def _values(self, field):
+        if field == 'status':
+            raise ValueError('Status is not numeric, use get_status_counts.')
+        values = np.array(self.get_field(field), dtype=float)
+        return values[~np.isnan(values)]
+
+    def mean(self, field='update_time'):
+        values = self._values(field)
+        return np.mean(values) if values.size > 0 else np.nan
+
+    def maximum(self, field='update_time'):
+        values = self._values(field)
+        return np.max(values) if values.size > 0 else np.nan
+
+    def percentile(self, field='update_time', q=99):
+        values = self._values(field)
+        return np.percentile(values, q) if values.size > 0 else np.nan
+
+    def get_status_counts(self):
+        return dict(col.Counter(self.get_field('status')))
+
+    def get_summary(self, percentiles=(50, 90, 99)):
+        summary = {'n_solves': self.n_solves, 'n_records': len(self._records),
+                   'status': self.get_status_counts()}
+        for field in self.fields:
+            if field == 'status':
+                continue
+            summary[field] = {'mean': self.mean(field),
+                              'max': self.maximum(field)}
+            for q in percentiles:
+                summary[field]['p%d' % q] = self.percentile(field, q)
+        return summary
@@ -227,10 +227,11 @@ class Export(object):
             for name, spl in child._splines_prim.items():
                 if name in child._variables:
                     if spl['init'] is not None:
+                        init = spl['init'].toarray()
                         tf = '{'
-                        for k in range(spl['init'].shape[0]):
+                        for k in range(init.shape[0]):
                             tf += '{'+','.join([str(t)
-                                                for t in spl['init'][k].tolist()])+'},'
+                                                for t in init[k].tolist()])+'},'
                         tf = tf[:-1]+'}'
                         defines.update({('%s_TF') % name.upper(): tf})
         return defines
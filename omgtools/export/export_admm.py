@@ -111,9 +111,10 @@ class ExportADMM(Export):
                         if set(range(sl_min, sl_max)) <= set(ind):
                             spl = child._splines_prim[name]
                             if spl['init'] is not None:
+                                init = spl['init'].toarray()
                                 tf = '{'
-                                for k in range(spl['init'].shape[0]):
-                                    tf += '{'+','.join([str(t) for t in spl['init'][k].tolist()])+'},'
+                                for k in range(init.shape[0]):
+                                    tf += '{'+','.join([str(t) for t in init[k].tolist()])+'},'
                                 tf = tf[:-1]+'}'
                                 defines.update({('XVAR_%s_TF') % name.upper(): tf})
                             break
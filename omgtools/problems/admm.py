@@ -393,6 +393,7 @@ class ADMM(DualUpdater):
         self.father_updx.set_variables(result['x'])
         self.var_admm['x_i'] = self._get_x_variables()
         stats = self.problem_upd_x.stats()
+        self.telemetry.record(t_upd, stats, result['f'])
         if (stats['return_status'] != 'Solve_Succeeded'):
             print 'upd_x %d: %s' % (self._index, stats['return_status'])
         return t_upd
@@ -0,0 +1,85 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from casadi import Callback, Sparsity, nlpsol_n_out, nlpsol_out
+import numpy as np
+import time
+
+
+class DeadlineCallback(Callback):
+    # Iteration callback of the nlp solver. It stops the solver when the
+    # compute budget of an update is spent and remembers the best feasible
+    # iterate it has seen, so a stopped solve still has a usable result.
+
+    def __init__(self, name, tol=1e-6):
+        Callback.__init__(self)
+        self.name = name
+        self.tol = tol
+        self.start(None, None, None)
+
+    def set_dimensions(self, n_var, n_par, n_con):
+        # called by create_nlp, once the size of the problem is known
+        self.n_var, self.n_par, self.n_con = n_var, n_par, n_con
+        self._index = dict([(nlpsol_out(i), i) for i in range(nlpsol_n_out())])
+        self.construct(self.name, {})
+
+    def start(self, budget, lbg, ubg):
+        self.budget = budget
+        self.lbg, self.ubg = lbg, ubg
+        self.best_x, self.best_f = None, np.inf
+        self.stopped = False
+        self.t0 = time.time()
+
+    def get_n_in(self):
+        return nlpsol_n_out()
+
+    def get_n_out(self):
+        return 1
+
+    def get_name_in(self, i):
+        return nlpsol_out(i)
+
+    def get_name_out(self, i):
+        return 'ret'
+
+    def get_sparsity_in(self, i):
+        # the inputs are the outputs of the nlp solver, with their shapes
+        name = nlpsol_out(i)
+        if name == 'f':
+            return Sparsity.scalar()
+        elif name in ('x', 'lam_x'):
+            return Sparsity.dense(self.n_var, 1)
+        elif name in ('g', 'lam_g'):
+            return Sparsity.dense(self.n_con, 1)
+        elif name == 'lam_p':
+            return Sparsity.dense(self.n_par, 1)
+        raise ValueError('Unknown output ' + name + ' of the nlp solver.')
+
+    def eval(self, arg):
+        if self.lbg is not None:
+            g = np.array(arg[self._index['g']]).ravel()
+            violation = np.max(np.r_[self.lbg - g, g - self.ubg, 0.])
+            f = float(arg[self._index['f']])
+            if violation <= self.tol and f < self.best_f:
+                self.best_x = np.array(arg[self._index['x']]).ravel()
+                self.best_f = f
+        if self.budget is not None and time.time() - self.t0 > self.budget:
+            self.stopped = True
+            return [1]
+        return [0]
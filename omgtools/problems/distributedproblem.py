@@ -18,6 +18,7 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
 from problem import Problem
+from ..basics.optilayer import wait_for_builds
 from casadi import symvar, Function
 import collections as col
 import numpy as np
@@ -83,7 +84,8 @@ class DistributedProblem(Problem):
                     buildtime.append(bt)
                     for u in upd[1:]:
                         u.init(problems)
-        return np.mean(buildtime)
+        # with parallel builds, all updaters compile at the same time
+        return np.mean(buildtime) + wait_for_builds()
 
     def separate_per_build(self):
         vehicle_types = self.fleet.sort_vehicles()
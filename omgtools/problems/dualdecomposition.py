@@ -202,6 +202,7 @@ class DDUpdater(DualUpdater):
         z_ij = self.father_updx.get_variables(self, 'z_ij', spline=False)
         self.var_dd['z_ij'] = self.q_ij_struct(z_ij)
         stats = self.problem_upd_xz.stats()
+        self.telemetry.record(t_upd, stats, result['f'])
         if (stats['return_status'] != 'Solve_Succeeded'):
             print 'upd_xz %d: %s' % (self._index, stats['return_status'])
         return t_upd
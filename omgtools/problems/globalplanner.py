@@ -59,6 +59,7 @@ class AStarPlanner(GlobalPlanner):
 
         # check if vehicle size needs to be taken into account while searching a global path
         self.veh_size = options['veh_size'] if 'veh_size' in options else [0.,0.]
+        self.verbose = options['verbose'] if 'verbose' in options else 1
 
         # make grid
         if ((grid_width == grid_height) and (n_cells[0] == n_cells[1])):
@@ -197,7 +198,8 @@ class AStarPlanner(GlobalPlanner):
                     raise RuntimeError('There is no path from the desired start to the desired end node!')
 
         t2 = time.time()
-        print 'Elapsed time to find a global path: ', t2-t1
+        if self.verbose >= 1:
+            print 'Elapsed time to find a global path: ', t2-t1
 
         # convert a set of nodes to a set of positions
         path = self.closed_list_to_path()
@@ -64,6 +64,12 @@ class MultiFrameProblem(Problem):
         # only required for frame_type shift
         self.frame_size = kwargs['frame_size'] if 'frame_size' in kwargs else 2.5
         self.cnt = 1  # frame counter
+        # number of obstacle slots: if given, the local problem is built once
+        # and reused for every frame, with the frame obstacles and border as
+        # parameters
+        self.n_slots = kwargs['obstacle_slots'] if 'obstacle_slots' in kwargs else None
+        self.templates = {}
+        self.children_owner = None  # problem that last constructed the vehicles
 
         # check if vehicle size is larger than the cell size
         n_cells = global_planner.grid.n_cells
@@ -154,8 +160,8 @@ class MultiFrameProblem(Problem):
                 # new moving obstacle in frame or obstacle disappeared from frame
                 # make a new local problem
                 problem = self.generate_problem()
-                # np.array converts DM to array
-                init_guess = np.array(self.local_problem.father.get_variables()[self.vehicles[0].label, 'splines0'])
+                init_guess = np.array(self.local_problem.father.get_variables(
+                    self.vehicles[0], 'splines0', spline=False))
                 problem.reset_init_guess(init_guess)  # use init_guess from previous problem = best we can do
                 self.local_problem = problem
 
@@ -1408,21 +1414,60 @@ class MultiFrameProblem(Problem):
 
     def generate_problem(self):
         # transform a frame description into a point2point problem
+        last_frame = self.frame['endpoint_frame'] == self.goal_state
+        if self.n_slots is not None:
+            problem = self.get_template_problem(last_frame)
+            obstacles = [obs for obs in self.frame['stationary_obstacles'] + self.frame['moving_obstacles']
+                         if obs.options['avoid']]
+            if problem.environment.fill_obstacle_slots(obstacles):
+                problem.environment.set_room({'shape': self.frame['border']['shape'],
+                                              'position': self.frame['border']['position']})
+                problem.initialize(current_time=0.)
+                return problem
+            print 'Frame obstacles do not fit in the obstacle slots, building a new problem'
         environment = Environment(room={'shape': self.frame['border']['shape'],
                                         'position': self.frame['border']['position'],
                                         'draw':True})
         for obstacle in self.frame['stationary_obstacles'] + self.frame['moving_obstacles']:
             environment.add_obstacle(obstacle)
+        return self.create_problem(environment, last_frame)
+
+    def get_template_problem(self, last_frame):
+        # the final velocity constraint changes the problem structure, so the
+        # last frame gets a template of its own
+        if last_frame not in self.templates:
+            environment = Environment(room={'shape': self.frame['border']['shape'],
+                                            'position': self.frame['border']['position']},
+                                      room_parameter=True)
+            environment.add_obstacle_slots(self.n_slots)
+            self.templates[last_frame] = self.create_problem(environment, last_frame)
+        problem = self.templates[last_frame]
+        if self.children_owner is not problem:
+            # the vehicles were constructed by another problem since: rebuild
+            # the children of the template, its compiled nlp is kept if they
+            # still fit
+            problem.father.reset()
+            problem.construct()
+            if not problem.father.check_children():
+                problem.init()
+            problem.father.init_transformations(problem.init_primal_transform,
+                                                problem.init_dual_transform)
+            problem.reinitialize()
+            self.children_owner = problem
+        return problem
+
+    def create_problem(self, environment, last_frame):
         # create a point-to-point problem
         problem_options = {}
         for key, value in self.problem_options.items():
             problem_options[key] = value
-        if self.frame['endpoint_frame'] == self.goal_state:  # current frame is the last one
+        if last_frame:  # current frame is the last one
             problem_options['no_term_con_der'] = False  # include final velocity = 0 constraint
         problem = Point2point(self.vehicles, environment, freeT=self.problem_options['freeT'], options=problem_options)
         problem.set_options({'solver_options': self.options['solver_options']})
         problem.init()
+        self.children_owner = problem
         # reset the current_time, to ensure that predict uses the provided
         # last input of previous problem and vehicle velocity is kept from one frame to another
         problem.initialize(current_time=0.)
-        return problem
\ No newline at end of file
+        return problem
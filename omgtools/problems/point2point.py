@@ -19,10 +19,15 @@
 
 from problem import Problem
 from ..basics.spline_extra import definite_integral
-from ..basics.spline_extra import shiftoverknot_T, shift_spline, evalspline
+from ..basics.spline_extra import shiftoverknot_T, shiftoverknot_dual_T
+from ..basics.spline_extra import shift_spline, evalspline
+from ..basics.optilayer import create_function
+from ..basics.parallel import fork_map
 from ..export.export_p2p import ExportP2P
-from casadi import inf
+from casadi import inf, DM, MX, conic, jacobian, gradient, dot, diag, fabs
+from casadi import fmax, mtimes
 import numpy as np
+import time
 
 
 class Point2point(object):
@@ -45,6 +50,13 @@ class Point2pointProblem(Problem):
     def set_default_options(self):
         Problem.set_default_options(self)
         self.options['inter_vehicle_avoidance'] = False
+        # real-time iterations: after a converged solve, every update solves
+        # one QP, linearized around the (shifted) previous solution
+        self.options['rti'] = False
+        self.options['rti_fallback'] = True
+        self.options['rti_regularization'] = 1e-6
+        self.options['qpsol'] = 'qpoases'
+        self.options['qpsol_options'] = {'printLevel': 'none'}
 
     # ========================================================================
     # Optimization modelling related functions
@@ -69,10 +81,185 @@ class Point2pointProblem(Problem):
                 self.define_constraint(
                     evalspline(spline, self.t0) - condition, 0., 0.)
 
+    def init(self):
+        buildtime = Problem.init(self)
+        self.rti_ready = False
+        if self.options['rti']:
+            buildtime += self.create_rti()
+        return buildtime
+
+    def create_rti(self):
+        t0 = time.time()
+        description = self.father.problem_description
+        var, par = description['var'].cat, description['par'].cat
+        obj, con = MX(description['obj']), description['con'].cat
+        lam = MX.sym('lam', con.shape[0])
+        hess = jacobian(gradient(obj + dot(lam, con), var), var)
+        # shift the diagonal of the hessian of the lagrangian until it is
+        # diagonally dominant (gershgorin), such that the qp is convex while
+        # the hessian keeps its sparsity
+        hess_diag = diag(hess)
+        radius = mtimes(fabs(hess), DM.ones(var.shape[0])) - fabs(hess_diag)
+        shift = fmax(radius - hess_diag, 0.) + self.options['rti_regularization']
+        hess = hess + diag(shift)
+        self.rti_linearization, _ = create_function(
+            'rti_' + self.label, [var, par, lam],
+            [hess, gradient(obj, var), obj, con, jacobian(con, var)],
+            self.options)
+        qp = {'h': self.rti_linearization.sparsity_out(0),
+              'a': self.rti_linearization.sparsity_out(4)}
+        self.rti_qp = conic('rti_qp', self.options['qpsol'], qp,
+                            self.options['qpsol_options'])
+        return time.time() - t0
+
     # ========================================================================
     # Deploying related functions
     # ========================================================================
 
+    def solve_nlp(self, current_time, var, par, lb, ub):
+        if not (self.options['rti'] and self.rti_ready):
+            t_upd = Problem.solve_nlp(self, current_time, var, par, lb, ub)
+            status = self.telemetry.get_last_record().status
+            self.rti_ready = self.options['rti'] and status == 'Solve_Succeeded'
+            return t_upd
+        # a single qp, linearized around the (shifted) previous solution, is
+        # recorded and falls back like a solve of the full problem
+        args = self.get_solver_args(var, par, lb, ub)
+        if self.deadline_callback is not None:
+            self.deadline_callback.start(self.compute_budget, lb, ub)
+        t0 = time.time()
+        lam_g = self.father.get_dual_variables()
+        hess, grad, obj, con, jac = self.rti_linearization(var, par, lam_g)
+        con = np.array(con).ravel()
+        qp_args = {'h': hess, 'g': grad, 'a': jac, 'lba': lb-con, 'uba': ub-con}
+        if 'lam_g0' in args:
+            qp_args['lam_a0'] = args['lam_g0']
+        try:
+            result = self.rti_qp(**qp_args)
+            status = 'RTI_Step'
+        except RuntimeError:
+            if not (self.options['rti_fallback'] or
+                    self.deadline_callback is not None):
+                raise
+            result, status = None, 'RTI_Failed'
+        t_upd = time.time() - t0
+        if result is None and self.options['rti_fallback']:
+            # the failed step is counted in the telemetry, next to the full
+            # solve that replaces it
+            self.telemetry.record(t_upd, {'return_status': status,
+                                          'iter_count': 0})
+            if self.options['verbose'] >= 1:
+                print 'RTI step failed, solving the full problem'
+            self.rti_ready = False
+            return t_upd + self.solve_nlp(current_time, var, par, lb, ub)
+        if result is None:
+            result = {'x': var, 'lam_g': lam_g, 'lam_x': np.zeros(var.size)}
+        else:
+            result = {'x': var + np.array(result['x']).ravel(),
+                      'lam_g': result['lam_a'], 'lam_x': result['lam_x']}
+        result['f'] = obj  # at the linearization point
+        self.set_solution(current_time, result,
+                          {'return_status': status, 'iter_count': 1},
+                          var, t_upd)
+        return t_upd
+
+    def solve_batch(self, initial, terminal, obstacles=None, inputs=None,
+                    jobs=None):
+        # Solve many independent queries with the built problem. Per vehicle,
+        # initial and terminal hold one row per query; per obstacle, obstacles
+        # holds a dict of such arrays with the keys of Obstacle.set_state.
+        # Queries are solved in forked processes that share the solver. Per
+        # vehicle, the result holds the coefficients of every spline variable.
+        if not hasattr(self, 'problem'):
+            self.init()
+        if len(self.vehicles) == 1:
+            initial, terminal = [initial], [terminal]
+            inputs = None if inputs is None else [inputs]
+        initial = [np.array(init, dtype=float, ndmin=2) for init in initial]
+        terminal = [np.array(term, dtype=float, ndmin=2) for term in terminal]
+        n_queries = initial[0].shape[0]
+        obstacles = obstacles or []
+        if (len(initial) != len(self.vehicles) or len(terminal) != len(self.vehicles)):
+            raise ValueError('Give initial and terminal conditions for every vehicle.')
+        if len(obstacles) > len(self.environment.obstacles):
+            raise ValueError('More obstacle states than obstacles in the environment.')
+        for values in initial + terminal:
+            if values.shape[0] != n_queries:
+                raise ValueError('Every condition should have %d rows.' % n_queries)
+        # build the numeric problem of every query
+        saved = [self._snapshot(vehicle, 'prediction') for vehicle in self.vehicles]
+        saved_obst = [self._snapshot(obstacle, 'signals')
+                      for obstacle in self.environment.obstacles]
+        var = self.father.get_variables().copy()
+        queries = []
+        try:
+            for k in range(n_queries):
+                for v, vehicle in enumerate(self.vehicles):
+                    input = None if inputs is None else np.array(inputs[v])[k]
+                    vehicle.set_initial_conditions(initial[v][k], input)
+                    vehicle.set_terminal_conditions(terminal[v][k])
+                    self.father.set_variables(vehicle.get_init_spline_value(),
+                                              vehicle, 'splines0')
+                for obstacle, states in zip(self.environment.obstacles, obstacles):
+                    obstacle.set_state(dict([(key, np.array(value)[k])
+                                             for key, value in states.items()]))
+                par = self.father.set_parameters(0.).copy()
+                lb, ub = self.father.update_bounds(0.)
+                queries.append((self.father.get_variables().copy(), par, lb, ub))
+        finally:
+            for vehicle, state in zip(self.vehicles, saved):
+                self._restore(vehicle, state)
+            for obstacle, state in zip(self.environment.obstacles, saved_obst):
+                self._restore(obstacle, state)
+            self.father.set_variables(var)
+
+        def solve(query):
+            x0, par, lb, ub = query
+            t0 = time.time()
+            result = self.problem(x0=x0, p=par, lbg=lb, ubg=ub)
+            stats = self.problem.stats()
+            return {'x': np.array(result['x']).ravel(), 'f': float(result['f']),
+                    'status': stats['return_status'], 'time': time.time() - t0,
+                    'iterations': stats['iter_count'] if 'iter_count' in stats else -1}
+        t0 = time.time()
+        results = fork_map(solve, queries, jobs)
+        t_batch = time.time() - t0
+        x = np.array([res['x'] for res in results])
+        # per vehicle, the coefficients of every spline variable
+        splines = []
+        for vehicle in self.vehicles:
+            splines.append({})
+            for name in vehicle._splines_prim:
+                if (vehicle, name) not in self.father._var_index:
+                    continue  # spline parameter or substitute
+                offset, size, shape = self.father._var_index[(vehicle, name)]
+                splines[-1][name] = np.array([row[offset:offset+size].reshape(shape, order='F')
+                                              for row in x])
+        status = [res['status'] for res in results]
+        return {'x': x, 'splines': splines[0] if len(splines) == 1 else splines,
+                'objective': np.array([res['f'] for res in results]),
+                'status': status,
+                'success': np.array([s == 'Solve_Succeeded' for s in status]),
+                'iterations': np.array([res['iterations'] for res in results]),
+                'time': np.array([res['time'] for res in results]),
+                'batch_time': t_batch, 'queries_per_second': n_queries/t_batch}
+
+    def _snapshot(self, child, signals):
+        # every attribute that setting conditions or a state may replace,
+        # e.g. poseT, pose0 or the theta_trT of a trailer
+        state = dict(child.__dict__)
+        state[signals] = dict(state[signals])
+        return state
+
+    def _restore(self, child, state):
+        child.__dict__.clear()
+        child.__dict__.update(state)
+
+    def reset_init_guess(self, init_guess=None):
+        Problem.reset_init_guess(self, init_guess)
+        # a new initial guess is no converged solution to linearize around
+        self.rti_ready = False
+
     def initialize(self, current_time):
         self.start_time = current_time
 
@@ -179,6 +366,14 @@ class FixedTPoint2point(Point2pointProblem):
         parameters[self]['T'] = self.options['horizon_time']
         return parameters
 
+    def get_parameter_scale(self):
+        scale = Point2pointProblem.get_parameter_scale(self)
+        # time parameters relative to the horizon
+        for name in ['T', 't']:
+            offset, size, _ = self.father._par_index[(self, name)]
+            scale[offset:offset+size] = self.options['horizon_time']
+        return scale
+
     # ========================================================================
     # Deploying related functions
     # ========================================================================
@@ -192,18 +387,19 @@ class FixedTPoint2point(Point2pointProblem):
         if (interval_prev < interval_now): # passed a knot
             self.father.transform_primal_splines(lambda coeffs, basis, T:
                                                  T.dot(coeffs))
-            # self.father.transform_dual_splines(lambda coeffs, basis, T:
-            #                                    T.dot(coeffs))
+            if self.options['dual_warm_start'] or self.options['rti']:
+                self.father.transform_dual_splines(lambda coeffs, basis, T:
+                                                   T.dot(coeffs))
         self.current_time_prev = current_time
 
     def init_primal_transform(self, basis):
         return shiftoverknot_T(basis)
 
-    # def init_dual_transform(self, basis):
-    #     B = integral_sqbasis(basis)
-    #     Binv = np.linalg.solve(B, np.eye(len(basis)))
-    #     T = shiftoverknot_T(basis)
-    #     return B.dot(T).dot(Binv)
+    def init_dual_transform(self, basis):
+        # only needed when the multipliers are reused
+        if self.options['dual_warm_start'] or self.options['rti']:
+            return shiftoverknot_dual_T(basis)
+        return None
 
     def initialize(self, current_time):
         Point2pointProblem.initialize(self, current_time)
@@ -309,6 +505,9 @@ class FreeTPoint2point(Point2pointProblem):
     # Deploying related functions
     # ========================================================================
 
+    def get_horizon_time(self):
+        return self.father.get_variables(self, 'T')[0][0]
+
     def store(self, current_time, update_time, sample_time):
         horizon_time = self.father.get_variables(self, 'T')[0][0]
         if self.init_time is None:
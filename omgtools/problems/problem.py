@@ -17,13 +17,32 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
-from ..basics.optilayer import OptiFather, OptiChild
+from ..basics.optilayer import OptiFather, OptiChild, LazyBuild, wait_for_builds
 from ..vehicles.fleet import get_fleet_vehicles
 from ..execution.plotlayer import PlotLayer
+from ..execution.telemetry import SolverTelemetry
+from ..basics.spline import BSpline
+from ..basics.parallel import fork_map
+from deadline import DeadlineCallback
+from warmstart import WarmStartLibrary
 from itertools import groupby
+import collections as col
 import numpy as np
 import time
 
+# results of a solve, from best to worst
+_fallback_levels = ['solution', 'best_feasible', 'previous', 'braking']
+# statuses of a solve of which the result is used as is
+_solved_statuses = ['Solve_Succeeded', 'Solved_To_Acceptable_Level', 'RTI_Step']
+
+# ipopt options for starting from the multipliers of the previous solve:
+# keep the warm start close to its point and start with a small barrier
+_dual_warm_start_options = {'ipopt.warm_start_init_point': 'yes',
+                            'ipopt.warm_start_bound_push': 1e-6,
+                            'ipopt.warm_start_slack_bound_push': 1e-6,
+                            'ipopt.warm_start_mult_bound_push': 1e-6,
+                            'ipopt.mu_init': 1e-4}
+
 
 class Problem(OptiChild, PlotLayer):
 
@@ -37,6 +56,8 @@ class Problem(OptiChild, PlotLayer):
         self.set_options(options)
         self.iteration = 0
         self.update_times = []
+        self.telemetry = SolverTelemetry(self.options['telemetry_size'])
+        self.recorded_solves = col.deque(maxlen=self.options['record_size'])
 
         # first add children and construct father, this allows making a
         # difference between the simulated and the processed vehicles,
@@ -53,13 +74,36 @@ class Problem(OptiChild, PlotLayer):
 
     def set_default_options(self):
         self.options = {'verbose': 2}
+        # number of solves kept in the telemetry ring buffer
+        self.options['telemetry_size'] = 1000
+        # pass the multipliers of the previous solve to the solver
+        self.options['dual_warm_start'] = False
+        # compute budget per update: None, 'auto' (budget_fraction of the
+        # update time) or a time in seconds. A solve that is stopped or fails
+        # falls back on the best feasible iterate, the shifted previous
+        # solution or, as a last resort, a braking trajectory.
+        self.options['compute_budget'] = None
+        self.options['budget_fraction'] = 0.8
+        self.options['max_fallback_previous'] = 5
+        # number of initial guesses solved in parallel at the first solve
+        # (0: off), and number of worker processes (None: all cores)
+        self.options['multi_start'] = 0
+        self.options['multi_start_jobs'] = None
+        # number of solutions kept to warm start a cold start from the nearest
+        # solved problem (0: off), and the largest normalized distance to it
+        self.options['warm_start_library'] = 0
+        self.options['warm_start_distance'] = None
+        # number of solver calls kept for replay, e.g. by SolverTuner (0: off)
+        self.options['record_size'] = 0
         self.options['solver'] = 'ipopt'
         ipopt_options = {'ipopt.tol': 1e-3,
                          'ipopt.warm_start_init_point': 'yes',
                          'ipopt.print_level': 0, 'print_time': 0,
                          'ipopt.fixed_variable_treatment':'make_constraint'}
         self.options['solver_options'] = {'ipopt': ipopt_options}
-        self.options['codegen'] = {'build': None, 'flags': '-O0'}
+        self.options['codegen'] = {'build': None, 'flags': '-O0',
+                                   'cache': False, 'cache_dir': None,
+                                   'cache_size': 1e9, 'jobs': None}
 
     def set_options(self, options):
         if 'solver_options' in options:
@@ -78,18 +122,77 @@ class Problem(OptiChild, PlotLayer):
     # ========================================================================
 
     def construct(self):
-        self.environment.init()
+        with self.father.profiler.child(self.environment.label):
+            self.environment.init(self.father.profiler)
         for vehicle in self.vehicles:
-            vehicle.init()
+            with self.father.profiler.child(vehicle.label):
+                vehicle.init()
 
     def init(self):
         self.father.reset()
-        self.construct()
-        self.problem, buildtime = self.father.construct_problem(self.options)
+        self.father.profiler.reset()
+        with self.father.profiler.phase('construct'):
+            self.construct()
+        if self.options['compute_budget'] is not None:
+            for vehicle in self.vehicles:
+                if not vehicle.braking:
+                    raise ValueError('A compute budget needs a braking ' +
+                                     'trajectory as last fallback, which ' +
+                                     vehicle.__class__.__name__ +
+                                     ' does not provide.')
+            self.deadline_callback = DeadlineCallback('deadline_'+self.label)
+        else:
+            self.deadline_callback = None
+        self.fallback_counts = dict([(level, 0) for level in _fallback_levels])
+        self.n_fallback_previous = 0
+        self.problem, buildtime = self.father.construct_problem(
+            self.options, callback=self.deadline_callback)
+        self.problem_warm = None
+        if self.options['dual_warm_start'] and self.options['solver'] == 'ipopt':
+            # warm started solves use a solver of the same build with the
+            # dual warm start options, unless they are set by the user
+            t0 = time.time()
+            ipopt_options = dict(_dual_warm_start_options)
+            ipopt_options.update(self.options['solver_options']['ipopt'])
+            self.problem_warm = self.father.load_nlp(ipopt_options)
+            buildtime += time.time() - t0
+        with self.father.profiler.phase('wait'):
+            buildtime += wait_for_builds()
         self.father.init_transformations(self.init_primal_transform,
                                          self.init_dual_transform)
+        self.build_time = buildtime
+        self.cold_start, self.warm_start = True, False
+        self.user_init_guess = False
+        size = self.options['warm_start_library']
+        if not size:
+            self.warm_start_library = None
+        elif getattr(self, 'warm_start_library', None) is None:
+            self.warm_start_library = WarmStartLibrary(
+                size, self.get_parameter_scale())
+        else:
+            # keep the stored solutions when the problem is rebuilt
+            self.warm_start_library.size = size
+            self.warm_start_library.set_scale(self.get_parameter_scale())
         return buildtime
 
+    def get_build_status(self):
+        # with a lazy build, the problem is solved without compiled code
+        # until the background build is loaded
+        if isinstance(self.problem, LazyBuild):
+            return self.problem.get_status()
+        return {'status': 'ready',
+                'compiled': self.options['codegen']['build'] is not None,
+                'build_time': self.build_time, 'error': None}
+
+    def get_telemetry(self, percentiles=(50, 90, 99)):
+        return self.telemetry.get_summary(percentiles)
+
+    def get_build_report(self):
+        return self.father.profiler.get_report()
+
+    def save_build_report(self, filename):
+        self.father.profiler.save(filename)
+
     # ========================================================================
     # Deploying related functions
     # ========================================================================
@@ -99,6 +202,8 @@ class Problem(OptiChild, PlotLayer):
             father = self.father
         father.init_variables()
         father.init_parameters()
+        self.cold_start = True
+        self.user_init_guess = False
 
     def solve(self, current_time, update_time):
         current_time -= self.start_time # start_time: the point in time where you start solving
@@ -107,14 +212,75 @@ class Problem(OptiChild, PlotLayer):
         var = self.father.get_variables()
         par = self.father.set_parameters(current_time)
         lb, ub = self.father.update_bounds(current_time)
+        # a reset of the initial guess during this solve marks the next one
+        cold_start, self.cold_start = self.cold_start, False
+        user_init_guess, self.user_init_guess = self.user_init_guess, False
+        self.warm_start = not cold_start
+        library = self.warm_start_library
+        # an initial guess given by the user is not replaced
+        if library is not None and cold_start and not user_init_guess:
+            entry = library.query(par, self.options['warm_start_distance'])
+            if entry is not None:
+                self.father.set_variables(entry['var'])
+                self.father.set_dual_variables(entry['lam_g'], entry['lam_x'])
+                var = self.father.get_variables()
         # solve!
+        self.compute_budget = self.get_compute_budget(current_time, update_time)
+        if self.options['multi_start'] and cold_start:
+            t_upd = self.solve_multi_start(var, par, lb, ub)
+        else:
+            t_upd = self.solve_nlp(current_time, var, par, lb, ub)
+        if (library is not None and
+                self.telemetry.get_last_record().status == 'Solve_Succeeded'):
+            library.add(par, self.father.get_variables(),
+                        self.father.get_dual_variables(),
+                        self.father.get_bound_dual_variables())
+        if self.options['verbose'] >= 2:
+            self.iteration += 1
+            if ((self.iteration-1) % 20 == 0):
+                print "----|------------|------------"
+                print "%3s | %10s | %10s " % ("It", "t upd", "time")
+                print "----|------------|------------"
+            print "%3d | %.4e | %.4e " % (self.iteration, t_upd, current_time)
+        self.update_times.append(t_upd)
+
+    def solve_nlp(self, current_time, var, par, lb, ub):
+        args = self.get_solver_args(var, par, lb, ub)
+        if self.deadline_callback is not None:
+            self.deadline_callback.start(self.compute_budget, lb, ub)
+        solver = self.get_solver()
         t0 = time.time()
-        result = self.problem(x0=var, p=par, lbg=lb, ubg=ub)
+        result = solver(**args)
         t1 = time.time()
         t_upd = t1-t0
+        self.set_solution(current_time, result, solver.stats(), var, t_upd)
+        return t_upd
+
+    def get_solver(self):
+        # only a solve from the multipliers of a previous one is warm started
+        if self.problem_warm is not None and self.warm_start:
+            return self.problem_warm
+        return self.problem
+
+    def get_solver_args(self, var, par, lb, ub):
+        args = {'x0': var, 'p': par, 'lbg': lb, 'ubg': ub}
+        if self.options['dual_warm_start']:
+            args['lam_g0'] = self.father.get_dual_variables()
+            args['lam_x0'] = self.father.get_bound_dual_variables()
+        if self.options['record_size'] > 0:
+            self.record_solve(args)
+        return args
+
+    def set_solution(self, current_time, result, stats, var, t_upd):
+        # record the solve and keep its result, or fall back on a previous
+        # one when a compute budget is set
+        self.telemetry.record(t_upd, stats, result['f'])
+        if self.deadline_callback is not None:
+            self.fallback(result, stats['return_status'], var)
+            return
         self.father.set_variables(result['x'])
-        stats = self.problem.stats()
-        if stats['return_status'] != 'Solve_Succeeded':
+        self.father.set_dual_variables(result['lam_g'], result['lam_x'])
+        if stats['return_status'] not in ['Solve_Succeeded', 'RTI_Step']:
             if stats['return_status'] == 'Maximum_CpuTime_Exceeded':
                 if current_time != 0.0:  # first iteration can be slow, neglect time here
                     print 'Maximum solving time exceeded, resetting initial guess'
@@ -123,14 +289,150 @@ class Problem(OptiChild, PlotLayer):
             else:
                 # there was another problem
                 print stats['return_status']
+
+    def record_solve(self, args):
+        if self.recorded_solves.maxlen != self.options['record_size']:
+            self.recorded_solves = col.deque(self.recorded_solves,
+                                             maxlen=self.options['record_size'])
+        # the solver arguments are buffers of the father, so copy them
+        self.recorded_solves.append(
+            dict([(key, np.array(value, dtype=float).ravel())
+                  for key, value in args.items()]))
+
+    def get_recorded_solves(self):
+        return list(self.recorded_solves)
+
+    def get_parameter_scale(self):
+        # fixed scale of every parameter to compare parameter vectors in the
+        # warm start library: the size of the room for the parameters of
+        # vehicles and obstacles, 1 for the other ones
+        limits = self.environment.room['shape'].get_canvas_limits()
+        extent = max([lim[1] - lim[0] for lim in limits])
+        children = self.vehicles + self.environment.obstacles
+        scale = np.ones(self.father._par_result.size)
+        for (child, name), (offset, size, _) in self.father._par_index.items():
+            if child in children:
+                scale[offset:offset+size] = extent
+        return scale
+
+    def get_init_guess_candidates(self, var):
+        candidates = [vehicle.get_init_spline_candidates(
+            self.environment, self.options['verbose']) for vehicle in self.vehicles]
+        n_cand = min(self.options['multi_start'],
+                     max([len(cand) for cand in candidates]))
+        guesses = []
+        for k in range(n_cand):
+            for vehicle, cand in zip(self.vehicles, candidates):
+                self.father.set_variables(cand[k % len(cand)], vehicle, 'splines0')
+            guesses.append(self.father.get_variables().copy())
+        self.father.set_variables(var)
+        return guesses
+
+    def solve_multi_start(self, var, par, lb, ub):
+        # solve from several initial guesses at once, in forked processes
+        # which share the built solver, and keep the best feasible result
+        t0 = time.time()
+        guesses = self.get_init_guess_candidates(var)
+
+        def solve(x0):
+            t_start = time.time()
+            if self.deadline_callback is not None:
+                # the budget holds for all solves together
+                budget = self.compute_budget
+                if budget is not None:
+                    budget = max(budget - (t_start - t0), 0.)
+                self.deadline_callback.start(budget, lb, ub)
+            result = self.problem(x0=x0, p=par, lbg=lb, ubg=ub)
+            t_solve = time.time() - t_start
+            # the scalar statistics are returned, as the telemetry of the
+            # forked process is lost
+            stats = dict([(key, value) for key, value in self.problem.stats().items()
+                          if isinstance(value, (bool, int, float, basestring))])
+            g = np.array(result['g']).ravel()
+            violation = np.max(np.r_[lb - g, g - ub, 0.])
+            best_x, best_f = None, np.inf
+            if self.deadline_callback is not None:
+                best_x = self.deadline_callback.best_x
+                best_f = self.deadline_callback.best_f
+            return {'x': np.array(result['x']).ravel(),
+                    'lam_g': np.array(result['lam_g']).ravel(),
+                    'lam_x': np.array(result['lam_x']).ravel(),
+                    'f': float(result['f']), 'status': stats['return_status'],
+                    'violation': violation, 'stats': stats, 't_solve': t_solve,
+                    'best_x': best_x, 'best_f': best_f}
+        results = fork_map(solve, guesses, self.options['multi_start_jobs'])
+        feasible = [res for res in results if res['status'] == 'Solve_Succeeded']
+        if feasible:
+            best = min(feasible, key=lambda res: res['f'])
+        else:
+            best = min(results, key=lambda res: res['violation'])
+            if self.deadline_callback is None:
+                print 'Multi-start found no solution, using the least infeasible result'
+        t_upd = time.time() - t0
+        if self.deadline_callback is not None:
+            # fall back on the best feasible iterate of all solves
+            stopped = min(results, key=lambda res: res['best_f'])
+            self.deadline_callback.start(None, None, None)
+            self.deadline_callback.best_x = stopped['best_x']
+            self.fallback(best, best['status'], var)
+        else:
+            self.father.set_variables(best['x'])
+            self.father.set_dual_variables(best['lam_g'], best['lam_x'])
+        # record every solve, the selected one last
+        for res in results:
+            if res is not best:
+                self.telemetry.record(res['t_solve'], res['stats'], res['f'])
+        self.telemetry.record(best['t_solve'], best['stats'], best['f'])
         if self.options['verbose'] >= 2:
-            self.iteration += 1
-            if ((self.iteration-1) % 20 == 0):
-                print "----|------------|------------"
-                print "%3s | %10s | %10s " % ("It", "t upd", "time")
-                print "----|------------|------------"
-            print "%3d | %.4e | %.4e " % (self.iteration, t_upd, current_time)
-        self.update_times.append(t_upd)
+            print 'Multi-start: %d of %d guesses solved, best objective %g' % (
+                len(feasible), len(results), best['f'])
+        return t_upd
+
+    def get_compute_budget(self, current_time, update_time):
+        budget = self.options['compute_budget']
+        # first iteration can be slow, neglect time here
+        if budget is None or current_time == 0.0 or not update_time:
+            return None
+        if budget == 'auto':
+            return self.options['budget_fraction']*update_time
+        return budget
+
+    def fallback(self, result, status, var):
+        if status in _solved_statuses:
+            level = 'solution'
+            self.father.set_variables(result['x'])
+            self.father.set_dual_variables(result['lam_g'], result['lam_x'])
+        elif self.deadline_callback.best_x is not None:
+            level = 'best_feasible'
+            self.father.set_variables(self.deadline_callback.best_x)
+        elif (self.n_fallback_previous < self.options['max_fallback_previous']
+                or not self.set_braking_trajectory()):
+            # var holds the previous solution, shifted by init_step
+            level = 'previous'
+            self.father.set_variables(var)
+        else:
+            level = 'braking'
+        if level == 'previous':
+            self.n_fallback_previous += 1
+        elif level != 'braking':
+            self.n_fallback_previous = 0
+        self.fallback_level = level
+        self.fallback_counts[level] += 1
+        if level != 'solution' and self.options['verbose'] >= 1:
+            print '%s, using %s' % (status, level.replace('_', ' '))
+        return level
+
+    def set_braking_trajectory(self):
+        values = [vehicle.get_braking_spline_value(self.get_horizon_time())
+                  for vehicle in self.vehicles]
+        if any([value is None for value in values]):
+            return False
+        for vehicle, value in zip(self.vehicles, values):
+            self.father.set_variables(value, vehicle, 'splines0')
+        return True
+
+    def get_horizon_time(self):
+        return self.options['horizon_time']
 
     def predict(self, current_time, predict_time, sample_time, states=None, delay=0):
         if states is None:
@@ -145,6 +447,7 @@ class Problem(OptiChild, PlotLayer):
             vehicle.predict(current_time, predict_time, sample_time, states[k], delay, enforce)
 
     def reset_init_guess(self, init_guess=None):
+            user_init_guess = init_guess is not None
             if init_guess is None:  # no user provided initial guess
                 init_guess = []
                 for k, vehicle in enumerate(self.vehicles):  # build list
@@ -161,6 +464,8 @@ class Problem(OptiChild, PlotLayer):
                             raise ValueError('Each vehicle spline should receive an initial guess.')
                         else:
                             self.father.set_variables(init_guess[l].tolist(),child=vehicle, name='splines'+str(l))
+            self.cold_start = True
+            self.user_init_guess = user_init_guess
 
     # ========================================================================
     # Simulation related functions
@@ -181,9 +486,10 @@ class Problem(OptiChild, PlotLayer):
             spline_values = vehicle.signals['splines'][:, -1]
             spline_values = [self.father.get_variables(
                 vehicle, 'splines'+str(k), spline=False)[-1, :] for k in range(vehicle.n_seg)]
-            for segment, values in zip(spline_segments, spline_values):
-                for spl, value in zip(segment, values):
-                    spl.coeffs = value*np.ones(len(spl.basis))
+            # splines returned by the father are shared, so build new ones
+            spline_segments = [[BSpline(spl.basis, value*np.ones(len(spl.basis)))
+                                for spl, value in zip(segment, values)]
+                               for segment, values in zip(spline_segments, spline_values)]
             vehicle.store(current_time, sample_time, spline_segments, sleep_time)
         # no correction for update time!
         Problem.simulate(self, current_time, sleep_time, sample_time)
@@ -0,0 +1,149 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from ..execution.benchmark import get_available_solvers
+import collections as col
+import numpy as np
+import time
+
+
+def _ipopt_search_space():
+    # every dimension lists the option sets it can take
+    push = ['ipopt.warm_start_bound_push', 'ipopt.warm_start_slack_bound_push',
+            'ipopt.warm_start_mult_bound_push']
+    linear_solvers = [name.split('_')[-1] for name in get_available_solvers(
+        col.OrderedDict([('ipopt_'+slv, ('ipopt', {'ipopt.linear_solver': slv}))
+                         for slv in ['mumps', 'ma27', 'ma57']]))]
+    return col.OrderedDict([
+        ('hessian_approximation',
+         [{'ipopt.hessian_approximation': h} for h in ['exact', 'limited-memory']]),
+        ('mu_strategy',
+         [{'ipopt.mu_strategy': mu} for mu in ['monotone', 'adaptive']]),
+        ('warm_start_push',
+         [dict([(key, value) for key in push]) for value in [1e-9, 1e-6, 1e-3]]),
+        ('linear_solver',
+         [{'ipopt.linear_solver': slv} for slv in linear_solvers])])
+
+
+class SolverTuner(object):
+    # Searches the solver options of a built problem by replaying solver
+    # calls recorded during a deployment (see the record_size option of
+    # Problem). Options are changed one dimension at a time and kept when
+    # they lower the p95 update time, while every objective stays within
+    # tolerance of the one found with the original options.
+
+    def __init__(self, problem, records=None, options=None):
+        self.problem = problem
+        self.records = records or problem.get_recorded_solves()
+        if not self.records:
+            raise ValueError('No recorded solves to replay, set the ' +
+                             'record_size option of the problem.')
+        self.set_default_options()
+        if options is not None:
+            self.options.update(options)
+
+    def set_default_options(self):
+        self.options = {'percentile': 95, 'objective_tolerance': 1e-2,
+                        'repeats': 1, 'max_rounds': 2, 'search_space': None,
+                        'verbose': 1}
+
+    def get_search_space(self):
+        if self.options['search_space'] is not None:
+            return self.options['search_space']
+        if self.problem.options['solver'] != 'ipopt':
+            raise ValueError('Give a search space for solver ' +
+                             self.problem.options['solver'] + '.')
+        return _ipopt_search_space()
+
+    def create_solver(self, solver_options):
+        # only the runtime options change: the solver is created from the
+        # build of the problem, e.g. its compiled code, without rebuilding
+        load_nlp = self.problem.father.load_nlp
+        if load_nlp is None:
+            raise ValueError('The solver of the problem is not built by ' +
+                             'its father, so it cannot be recreated.')
+        solver = load_nlp(solver_options)
+        if hasattr(solver, 'wait'):
+            # replay with the compiled code of a parallel or lazy build
+            solver = solver.wait()
+        return solver
+
+    def replay(self, solver_options):
+        solver = self.create_solver(solver_options)
+        times = np.zeros(len(self.records))
+        objective = np.zeros(len(self.records))
+        success = np.zeros(len(self.records), dtype=bool)
+        deadline = self.problem.deadline_callback
+        for k, record in enumerate(self.records):
+            times[k] = np.inf
+            for repeat in range(self.options['repeats']):
+                if deadline is not None:
+                    # replays are not bound by the compute budget
+                    deadline.start(None, None, None)
+                t0 = time.time()
+                result = solver(**record)
+                times[k] = min(times[k], time.time() - t0)
+            objective[k] = float(result['f'])
+            success[k] = solver.stats()['return_status'] in [
+                'Solve_Succeeded', 'Solved_To_Acceptable_Level']
+        return {'latency': np.percentile(times, self.options['percentile']),
+                'objective': objective, 'success': success}
+
+    def accept(self, replay, reference):
+        tol = self.options['objective_tolerance']
+        close = (np.abs(replay['objective'] - reference['objective']) <=
+                 tol*np.maximum(1., np.abs(reference['objective'])))
+        # calls that failed with the original options need not succeed
+        return bool(np.all((close & replay['success']) | ~reference['success']))
+
+    def tune(self):
+        solver = self.problem.options['solver']
+        best_options = dict(self.problem.options['solver_options'][solver])
+        reference = self.replay(best_options)
+        best = reference['latency']
+        history = [{'options': {}, 'latency': best, 'accepted': True}]
+        if self.options['verbose'] >= 1:
+            print 'Original options: p%d update time %.3f ms' % (
+                self.options['percentile'], best*1e3)
+        space = self.get_search_space()
+        for _ in range(self.options['max_rounds']):
+            improved = False
+            for name, values in space.items():
+                for value in values:
+                    candidate = dict(best_options, **value)
+                    if candidate == best_options:
+                        continue
+                    try:
+                        replay = self.replay(candidate)
+                    except RuntimeError:
+                        continue
+                    accepted = (self.accept(replay, reference) and
+                                replay['latency'] < best)
+                    history.append({'options': value, 'accepted': accepted,
+                                    'latency': replay['latency']})
+                    if self.options['verbose'] >= 1:
+                        print '%-22s %-40s %.3f ms%s' % (
+                            name, value.values()[0], replay['latency']*1e3,
+                            ' *' if accepted else '')
+                    if accepted:
+                        best_options, best, improved = candidate, replay['latency'], True
+            if not improved:
+                break
+        return {'solver_options': best_options, 'latency': best,
+                'reference_latency': reference['latency'], 'history': history}
@@ -0,0 +1,110 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from scipy.spatial import cKDTree
+import collections as col
+import numpy as np
+
+
+class WarmStartLibrary(object):
+    # Stores solutions of solved problems, keyed by their parameter vector.
+    # The nearest stored solution, measured on parameter vectors divided by
+    # fixed scales (e.g. the size of the room), is used as initial guess. The
+    # scales do not depend on the stored solutions, so neither do distances.
+    # The least recently used solution is dropped when the library is full.
+
+    def __init__(self, size=1000, scale=1.):
+        self.size = size
+        self.set_scale(scale)
+        self.clear()
+
+    def set_scale(self, scale):
+        # a scalar or one scale per parameter
+        scale = np.array(scale, dtype=float).ravel()
+        if np.any(scale <= 0.):
+            raise ValueError('Parameter scales should be positive.')
+        self.scale = scale
+        self._tree = None
+
+    def clear(self):
+        self._entries = col.OrderedDict()
+        self._count = 0
+        self._tree = None
+        self.n_hits, self.n_misses = 0, 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, par, var, lam_g, lam_x):
+        entry = {'par': np.array(par, dtype=float).ravel(),
+                 'var': np.array(var, dtype=float).ravel(),
+                 'lam_g': np.array(lam_g, dtype=float).ravel(),
+                 'lam_x': np.array(lam_x, dtype=float).ravel()}
+        if self._entries:
+            first = self._entries.values()[0]
+            for key, value in entry.items():
+                if value.size != first[key].size:
+                    raise ValueError('Size of ' + key + ' differs from the ' +
+                                     'stored solutions.')
+        self._entries[self._count] = entry
+        self._count += 1
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        self._tree = None
+
+    def query(self, par, max_distance=None):
+        if not self._entries:
+            self.n_misses += 1
+            return None
+        if self._tree is None:
+            self._build_tree()
+        par = np.array(par, dtype=float).ravel()
+        if par.size != self._tree.m:
+            raise ValueError('Size of parameter vector differs from the ' +
+                             'stored solutions.')
+        distance, index = self._tree.query(par/self.scale)
+        if max_distance is not None and distance > max_distance:
+            self.n_misses += 1
+            return None
+        self.n_hits += 1
+        # mark as recently used, the tree does not depend on the order
+        key = self._keys[index]
+        entry = self._entries.pop(key)
+        self._entries[key] = entry
+        return dict(entry, distance=distance)
+
+    def _build_tree(self):
+        self._keys = self._entries.keys()
+        par = np.array([entry['par'] for entry in self._entries.values()])
+        if self.scale.size not in (1, par.shape[1]):
+            raise ValueError('Give one scale per parameter.')
+        self._tree = cKDTree(par/self.scale)
+
+    def save(self, filename):
+        entries = self._entries.values()
+        data = dict([(key, np.array([entry[key] for entry in entries]))
+                     for key in ['par', 'var', 'lam_g', 'lam_x']])
+        np.savez_compressed(filename, **data)
+
+    def load(self, filename):
+        # loaded solutions are added to the stored ones, oldest first
+        data = np.load(filename)
+        for k in range(data['par'].shape[0]):
+            self.add(data['par'][k], data['var'][k],
+                     data['lam_g'][k], data['lam_x'][k])
@@ -25,6 +25,7 @@ import numpy as np
 
 
 class Holonomic(Vehicle):
+    braking = True
 
     def __init__(self, shapes=Circle(0.1), options=None, bounds=None):
         bounds = bounds or {}
@@ -125,6 +126,61 @@ class Holonomic(Vehicle):
             init_value[:, k] = np.linspace(pos0[k], posT[k], len(self.basis))
         return init_value
 
+    def get_init_spline_candidates(self, environment, verbose=0):
+        # straight line, detours along both sides of the obstacle that blocks
+        # it the most and the path of an A* planner
+        pos0 = np.array(self.prediction['state'][:2], dtype=float)
+        posT = np.array(self.poseT[:2], dtype=float)
+        if np.allclose(pos0, posT):
+            return [self.get_init_spline_value()]
+        paths = [[pos0, posT]]
+        size = max([np.max(np.abs(lim)) for lim in self.shapes[0].get_canvas_limits()])
+        blocking = self._get_blocking_obstacle(environment, pos0, posT, size)
+        if blocking is not None:
+            center, radius = blocking
+            direction = (posT - pos0)/np.linalg.norm(posT - pos0)
+            normal = np.array([-direction[1], direction[0]])
+            for side in [1., -1.]:
+                paths.append([pos0, center + side*1.5*(radius+size)*normal, posT])
+        try:
+            from ..problems.globalplanner import AStarPlanner
+            planner = AStarPlanner(environment, [20, 20], pos0.tolist(),
+                                   posT.tolist(), {'veh_size': [size, size],
+                                                   'verbose': int(verbose >= 2)})
+            path = planner.get_path()
+            paths.append([pos0] + [np.array(p, dtype=float) for p in path[1:-1]] + [posT])
+        except Exception as error:
+            # e.g. no grid for this room or no path found: the other
+            # guesses remain
+            if verbose >= 1:
+                print 'No initial guess from the A* planner: %s' % error
+        return [self._path2spline_value(path) for path in paths]
+
+    def _get_blocking_obstacle(self, environment, pos0, posT, size):
+        # obstacle which comes closest to the straight line, relative to its size
+        blocking, clearance = None, 0.
+        for obstacle in environment.obstacles:
+            if not obstacle.options['avoid']:
+                continue
+            center = obstacle.signals['position'][:2, -1]
+            radius = max([np.max(np.abs(lim)) for lim in obstacle.shape.get_canvas_limits()])
+            s = np.dot(center-pos0, posT-pos0)/np.dot(posT-pos0, posT-pos0)
+            distance = np.linalg.norm(pos0 + np.clip(s, 0., 1.)*(posT-pos0) - center)
+            if distance - radius - size < clearance:
+                blocking, clearance = (center, radius), distance - radius - size
+        return blocking
+
+    def _path2spline_value(self, path):
+        # coefficients spread evenly over the length of a piecewise linear path
+        path = np.array(path)
+        length = np.r_[0., np.cumsum(np.linalg.norm(np.diff(path, axis=0), axis=1))]
+        samples = np.linspace(0., length[-1], len(self.basis))
+        return np.c_[np.interp(samples, length, path[:, 0]),
+                     np.interp(samples, length, path[:, 1])]
+
+    def get_braking_spline_value(self, horizon_time):
+        return self._get_braking_position_value(horizon_time)
+
     def check_terminal_conditions(self):
         tol = self.options['stop_tol']
         if (np.linalg.norm(self.signals['state'][:, -1] - self.poseT) > tol or
@@ -25,6 +25,7 @@ import numpy as np
 
 
 class Holonomic1D(Vehicle):
+    braking = True
 
     def __init__(self, width=0.7, height=0.1, options=None, bounds=None):
         bounds = bounds or {}
@@ -71,6 +72,9 @@ class Holonomic1D(Vehicle):
     def set_terminal_conditions(self, position):
         self.poseT = position
 
+    def get_braking_spline_value(self, horizon_time):
+        return self._get_braking_position_value(horizon_time)
+
     def get_init_spline_value(self):
         pos0 = self.prediction['state'][0]
         posT = self.poseT[0]
@@ -24,6 +24,7 @@ import numpy as np
 
 
 class Holonomic3D(Vehicle):
+    braking = True
 
     def __init__(self, shapes, options=None, bounds=None):
         bounds = bounds or {}
@@ -98,6 +99,9 @@ class Holonomic3D(Vehicle):
     def set_terminal_conditions(self, position):
         self.poseT = position
 
+    def get_braking_spline_value(self, horizon_time):
+        return self._get_braking_position_value(horizon_time)
+
     def get_init_spline_value(self):
         init_value = np.zeros((len(self.basis), 3))
         pos0 = self.prediction['state']
@@ -32,6 +32,8 @@ import numpy as np
 
 
 class Vehicle(OptiChild, PlotLayer):
+    # does get_braking_spline_value provide a braking trajectory?
+    braking = False
 
     def __init__(self, n_spl, degree, shapes, options=None):
         options = options or {}
@@ -128,6 +130,7 @@ class Vehicle(OptiChild, PlotLayer):
                 for k, hyperplane in enumerate(hyperplanes[shape]):
                     a, b = hyperplane['a'], hyperplane['b']
                     sl = 1 if 'slack' not in hyperplane else hyperplane['slack']
+                    relax = 0. if 'relax' not in hyperplane else hyperplane['relax']
                     if safety_distance > 0.:
                         eps = self.define_spline_variable(
                             'eps_'+str(s)+str(k))[0]
@@ -147,7 +150,7 @@ class Vehicle(OptiChild, PlotLayer):
                         pos[0] = position[0]*(1+tg_ha**2) + offset*(1-tg_ha**2)
                         pos[1] = position[1]*(1+tg_ha**2) + offset*(2*tg_ha)
                         con += (a[0]*pos[0] + a[1]*pos[1])
-                        con += (-b+sl*rad[l]+safety_distance-eps)*(1+tg_ha**2)
+                        con += (-b+sl*rad[l]+safety_distance-eps-relax)*(1+tg_ha**2)
                         self.define_constraint(con, -inf, 0)
             # room constraints
             # check room shape and orientation,
@@ -161,13 +164,13 @@ class Vehicle(OptiChild, PlotLayer):
                     (isinstance(shape, (Rectangle, Square)) and
                      shape.orientation == 0)) and
                     (isinstance(tg_ha, (int, float, long)) and tg_ha == 0.)):
-                    room_limits = environment.get_canvas_limits()
+                    room_limits = environment.get_room_limits()
                     for chck in checkpoints:
                         for k in range(2):
                             self.define_constraint(-(chck[k]+position[k]) + room_limits[k][0] + rad[0], -inf, 0.)
                             self.define_constraint((chck[k]+position[k]) - room_limits[k][1] + rad[0], -inf, 0.)
                 else:
-                    hyp_room = environment.room['shape'].get_hyperplanes(position = environment.room['position'])
+                    hyp_room = environment.get_room_hyperplanes()
                     for l, chck in enumerate(checkpoints):
                         for hpp in hyp_room.itervalues():
                             con = 0
@@ -213,7 +216,7 @@ class Vehicle(OptiChild, PlotLayer):
                             sum([a[k]*(chck[k]+position[k]) for k in range(3)])-b+rad[l], -inf, 0)
             # room constraints
             if self.options['room_constraints']:
-                room_lim = environment.get_canvas_limits()
+                room_lim = environment.get_room_limits()
                 for chck in checkpoints:
                     for k in range(3):
                         self.define_constraint(-
@@ -302,6 +305,28 @@ class Vehicle(OptiChild, PlotLayer):
             self.prediction['input'] = self.trajectories['input'][:, n_samp+delay]
             self.prediction['pose'] = self._state2pose(state[:, -1])
 
+    def get_init_spline_candidates(self, environment, verbose=0):
+        # diverse initial guesses for a multi-start first solve
+        return [self.get_init_spline_value()]
+
+    def get_braking_spline_value(self, horizon_time):
+        # spline coefficients which bring the vehicle from its predicted
+        # state to standstill, used when no (recent) solution is available;
+        # None if the vehicle does not provide one
+        return None
+
+    def _get_braking_position_value(self, horizon_time):
+        # braking trajectory of a vehicle of which the splines are its
+        # position and the input its velocity: keep the initial position and
+        # velocity, and come to standstill at the end of the first knot
+        # interval
+        pos0 = np.atleast_1d(np.array(self.prediction['state'], dtype=float))
+        vel0 = np.atleast_1d(np.array(self.prediction['input'], dtype=float))
+        knots, deg = self.basis.knots, self.degree
+        pos1 = pos0 + horizon_time*vel0*(knots[deg+1]-knots[1])/deg
+        value = np.tile(pos1, (len(self.basis), 1))
+        value[0, :] = pos0
+        return value
 
     # ========================================================================
     # Simulation related functions
@@ -0,0 +1,37 @@
+import json
+import os
+import tempfile
+from omgtools import *
+
+
+def test_available_solvers():
+    solvers = get_available_solvers()
+    # mumps comes with every ipopt build
+    assert 'ipopt_mumps' in solvers
+    unknown = {'unknown': ('no_such_solver', {})}
+    assert len(get_available_solvers(unknown)) == 0
+
+
+def test_benchmark():
+    benchmark = SolverBenchmark(vehicles=['holonomic'], n_obstacles=[1],
+                                freeT=[False], solvers=['ipopt_mumps'],
+                                options={'max_updates': 5, 'verbose': 0})
+    report = benchmark.run()
+    assert len(report['results']) == 1
+    result = report['results'][0]
+    assert result['error'] is None
+    assert result['n_updates'] == 5
+    assert result['iterations']['mean'] > 0
+    filename = os.path.join(tempfile.mkdtemp(), 'benchmark.json')
+    benchmark.save(filename)
+    with open(filename, 'r') as f:
+        assert json.load(f) == json.loads(json.dumps(report))
+    os.remove(filename)
+
+
+def test_unknown_vehicle():
+    try:
+        SolverBenchmark(vehicles=['unicycle'])
+        assert False
+    except ValueError:
+        pass
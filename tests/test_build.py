@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+import numpy as np
+from omgtools import *
+from omgtools.basics.optilayer import get_cache_stats, reset_cache_stats
+
+
+def create_problem(codegen):
+    vehicle = Holonomic()
+    vehicle.set_initial_conditions([-1.5, -1.5])
+    vehicle.set_terminal_conditions([2., 2.])
+    environment = Environment(room={'shape': Square(5.)})
+    environment.add_obstacle(Obstacle({'position': [0., 0.]},
+                                      shape=Circle(0.4)))
+    problem = Point2point(vehicle, environment,
+                          {'verbose': 0, 'codegen': codegen}, freeT=True)
+    return problem
+
+
+def solve(problem):
+    problem.solve(0., 0.1)
+    return problem.telemetry.get_last_record().status
+
+
+def test_cache():
+    # a second build of the same problem reuses the compiled solver
+    directory = tempfile.mkdtemp()
+    try:
+        reset_cache_stats()
+        codegen = {'build': 'shared', 'cache': True, 'cache_dir': directory}
+        problem = create_problem(codegen)
+        problem.init()
+        misses = get_cache_stats()['misses']
+        assert misses > 0 and get_cache_stats()['hits'] == 0
+        problem = create_problem(codegen)
+        problem.init()
+        assert get_cache_stats()['hits'] == misses
+        assert get_cache_stats()['misses'] == misses
+        assert solve(problem) == 'Solve_Succeeded'
+        # a lazy build looks up the cache in its own process
+        reset_cache_stats()
+        problem = create_problem(dict(codegen, build='lazy'))
+        problem.init()
+        problem.problem.wait()
+        assert get_cache_stats()['hits'] == 1
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_parallel():
+    # the compiled solver gives the solution of the uncompiled one
+    reference = create_problem({'build': None})
+    reference.init()
+    solve(reference)
+    problem = create_problem({'build': 'parallel', 'jobs': 2})
+    problem.init()
+    assert problem.get_build_status()['compiled']
+    assert solve(problem) == 'Solve_Succeeded'
+    assert np.allclose(problem.father.get_variables(),
+                       reference.father.get_variables(), atol=1e-3)
+
+
+def test_lazy():
+    # the uncompiled solver is used until the compiled one is loaded
+    problem = create_problem({'build': 'lazy'})
+    problem.init()
+    assert problem.get_build_status()['status'] in ['building', 'ready']
+    assert solve(problem) == 'Solve_Succeeded'
+    problem.problem.wait()
+    status = problem.get_build_status()
+    assert status['status'] == 'ready' and status['compiled']
+    assert status['error'] is None
+    assert solve(problem) == 'Solve_Succeeded'
+    # a solver with other options is built from the same compiled code
+    options = dict(problem.options['solver_options']['ipopt'])
+    options['ipopt.mu_strategy'] = 'adaptive'
+    variant = problem.father.load_nlp(options)
+    variant(x0=problem.father.get_variables(),
+            p=problem.father.set_parameters(0.),
+            lbg=problem.father.update_bounds(0.)[0],
+            ubg=problem.father.update_bounds(0.)[1])
+    assert variant.stats()['return_status'] == 'Solve_Succeeded'
@@ -0,0 +1,76 @@
+import threading
+import numpy as np
+from omgtools.basics.cache import LRUCache, array_key
+from omgtools.basics.spline import BSplineBasis, get_spline_cache_stats
+from omgtools.basics.spline import basis_cache, eval_cache
+
+
+def test_lru_cache():
+    cache = LRUCache(size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # a is now used last
+    cache.put('c', 3)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.get('b') is None
+    assert cache.get_or_create('d', lambda: 4) == 4
+    assert cache.get_or_create('d', lambda: 5) == 4
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 2, 2)
+    cache.resize(1)
+    assert len(cache) == 1 and 'd' in cache
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_threads():
+    cache = LRUCache(size=50)
+
+    def work(offset):
+        for k in range(1000):
+            cache.get_or_create((offset + k) % 100, lambda: k)
+    threads = [threading.Thread(target=work, args=(10*k,)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.get_stats()
+    assert len(cache) == 50
+    assert stats['hits'] + stats['misses'] == 4000
+
+
+def test_array_key():
+    assert array_key([1, 2]) == array_key(np.array([1., 2.]))
+    assert array_key([1., 2.]) != array_key([[1., 2.]])
+    try:
+        array_key(['a'])
+        assert False
+    except TypeError:
+        pass
+
+
+def test_spline_caches():
+    basis_cache.clear()
+    eval_cache.clear()
+    stats0 = get_spline_cache_stats()
+    knots = np.r_[0., 0., np.linspace(0., 1., 6), 1., 1.]
+    basis = BSplineBasis(knots, 2)
+    # equal bases are shared
+    assert BSplineBasis(list(knots), 2) is basis
+    x = np.linspace(0., 1., 11)
+    B = basis(x)
+    assert basis(x.copy()) is B
+    stats = get_spline_cache_stats()
+    assert stats['basis']['hits'] - stats0['basis']['hits'] >= 1
+    assert stats['eval_basis']['hits'] - stats0['eval_basis']['hits'] >= 1
+    assert stats['eval_basis']['entries'] <= stats['eval_basis']['size']
+    # a basis in use is not replaced when it is evicted
+    size = basis_cache.size
+    basis_cache.resize(1)
+    try:
+        other = BSplineBasis(np.r_[0., 0., 0., 1., 1., 1.], 2)
+        assert len(basis_cache) == 1
+        assert BSplineBasis(knots, 2) is basis
+        assert BSplineBasis(np.r_[0., 0., 0., 1., 1., 1.], 2) is other
+    finally:
+        basis_cache.resize(size)
@@ -0,0 +1,107 @@
+import time
+import numpy as np
+from omgtools.execution.deployer import AsyncDeployer
+from omgtools.execution.telemetry import SolverTelemetry
+
+
+class Vehicle(object):
+    pass
+
+
+class SlowProblem(object):
+    # stands in for a problem of which every solve takes solve_time
+
+    def __init__(self, solve_time):
+        self.solve_time = solve_time
+        self.vehicles = [Vehicle()]
+
+    def initialize(self, current_time):
+        pass
+
+    def reinitialize(self):
+        pass
+
+    def predict(self, current_time, update_time, sample_time, states, delay):
+        pass
+
+    def solve(self, current_time, update_time):
+        time.sleep(self.solve_time)
+
+    def store(self, current_time, update_time, sample_time):
+        time_axis = np.arange(current_time, current_time + 10., sample_time)
+        self.vehicles[0].trajectories = {'time': time_axis[None, :],
+                                         'state': time_axis[None, :]}
+
+
+def test_deadline_miss():
+    # a slow solve is a deadline miss, even when update is not called while
+    # it runs
+    deployer = AsyncDeployer(SlowProblem(0.05), update_time=0.1,
+                             deadline=0.01)
+    deployer.update(0.)
+    deployer.wait()
+    statistics = deployer.get_statistics()
+    assert statistics['n_solves'] == 1
+    assert statistics['n_deadline_misses'] == 1
+
+
+def test_deadline_met():
+    deployer = AsyncDeployer(SlowProblem(0.), update_time=0.1, deadline=1.)
+    for k in range(3):
+        deployer.update(0.1*k)
+        deployer.wait()
+    statistics = deployer.get_statistics()
+    assert statistics['n_solves'] == 3
+    assert statistics['n_deadline_misses'] == 0
+
+
+def test_late_plan():
+    # a plan that is finished after the deadline is never published, the
+    # previous one is kept and the next update starts from it
+    problem = SlowProblem(0.)
+    deployer = AsyncDeployer(problem, update_time=0.1, deadline=0.05)
+    deployer.update(0.)
+    deployer.wait()
+    problem.solve_time = 0.1
+    deployer.update(0.1)
+    deployer.wait()
+    assert deployer.get_statistics()['n_deadline_misses'] == 1
+    assert deployer.get_trajectories()['time'][0, 0] == 0.
+    assert problem.vehicles[0].trajectories['time'][0, 0] == 0.
+    assert deployer.current_time == 0.
+    # the published plan is a copy
+    problem.vehicles[0].trajectories['time'][0, 0] = -1.
+    assert deployer.get_trajectories()['time'][0, 0] == 0.
+
+
+def test_previous_plan():
+    # while solving, update returns the published plan, shifted in time
+    deployer = AsyncDeployer(SlowProblem(0.2), update_time=0.1)
+    deployer.update(0.)
+    deployer.update(0.1)
+    trajectories = deployer.update(0.15)
+    assert abs(trajectories['time'][0, 0] - 0.15) < 1e-6
+    deployer.wait()
+
+
+def test_telemetry():
+    telemetry = SolverTelemetry(size=3)
+    for k in range(5):
+        stats = {'return_status': 'Solve_Succeeded' if k % 2 else 'Failed',
+                 'iter_count': k, 't_mainloop': 1., 't_eval_f': 0.1,
+                 't_eval_g': 0.1}
+        telemetry.record(0.1*(k+1), stats, objective=float(k))
+    # only the last solves are kept
+    assert telemetry.n_solves == 5 and len(telemetry.get_records()) == 3
+    assert telemetry.get_field('iterations') == [2., 3., 4.]
+    assert np.isclose(telemetry.mean(), 0.4)
+    assert np.isclose(telemetry.maximum('objective'), 4.)
+    assert telemetry.get_status_counts() == {'Failed': 2, 'Solve_Succeeded': 1}
+    record = telemetry.get_last_record()
+    assert np.isclose(record.t_function, 0.2)
+    assert np.isclose(record.t_solver, 0.8)
+    # missing statistics are nan and left out of the summary
+    assert np.isnan(record.t_hessian)
+    summary = telemetry.get_summary(percentiles=(50,))
+    assert np.isnan(summary['t_hessian']['mean'])
+    assert np.isclose(summary['update_time']['p50'], 0.4)
@@ -0,0 +1,128 @@
+import copy
+import numpy as np
+from casadi import inf, Function
+from omgtools.basics.optilayer import OptiChild, OptiFather
+
+
+class Child(OptiChild):
+
+    def __init__(self, label, parameters=None):
+        OptiChild.__init__(self, label)
+        self.parameters = parameters
+
+    def set_parameters(self, time):
+        if self.parameters is None:
+            return {}
+        return {self: self.parameters(time)}
+
+
+def create_father():
+    # owner defines x and p, user refers to them by symbols
+    owner = Child('owner', lambda t: {'p': [t, 2*t]})
+    owner.define_variable('x', 2, value=np.array([[1.], [2.]]))
+    owner.define_parameter('p', 2)
+    user = Child('user')
+    x = user.define_symbol('x', 2)
+    p = user.define_symbol('p', 2)
+    user.define_constraint(x[0] - p[0], 0., 0.)
+    user.define_constraint(x[1], -1., 1., shutdown='t > 1.')
+    user.define_objective(x[0]**2 + p[1])
+    father = OptiFather([owner, user])
+    father.compose_dictionary()
+    father.translate_symbols()
+    variables = father.construct_variables()
+    parameters = father.construct_parameters()
+    father.construct_substitutes(variables, parameters)
+    constraints, _, _ = father.construct_constraints(variables, parameters)
+    objective = father.construct_objective(variables, parameters)
+    father.init_variables()
+    father.init_parameters()
+    return father, owner, user, (variables, parameters, constraints, objective)
+
+
+def test_update_bounds():
+    father, owner, user, _ = create_father()
+    for t in [0., 0.5, 2.]:
+        lb, ub = father.update_bounds(t)
+        # the bounds as they were computed on the constraint structs
+        lb_ref, ub_ref = copy.deepcopy(father._lb), copy.deepcopy(father._ub)
+        for name, shutdown in father._constraint_shutdown.items():
+            if eval('lambda t: %s' % shutdown)(t):
+                lb_ref[name], ub_ref[name] = -inf, +inf
+        assert np.array_equal(lb, np.array(lb_ref.cat).ravel())
+        assert np.array_equal(ub, np.array(ub_ref.cat).ravel())
+    lb, ub = father.update_bounds(2.)
+    assert np.array_equal(lb, [0., -inf]) and np.array_equal(ub, [0., inf])
+    # the stored bounds are not modified
+    lb, ub = father.update_bounds(0.)
+    assert np.array_equal(lb, [0., -1.]) and np.array_equal(ub, [0., 1.])
+
+
+def test_set_parameters():
+    father, owner, user, _ = create_father()
+    par = father.set_parameters(1.5)
+    assert np.array_equal(father.get_parameters(owner, 'p').ravel(), [1.5, 3.])
+    # the flat vector agrees with the parameter struct
+    par_struct = father.get_parameters()
+    assert np.array_equal(np.array(par_struct[owner.label, 'p']).ravel(), [1.5, 3.])
+    assert np.array_equal(np.array(par_struct.cat).ravel(), par)
+    # the flat vector is updated in place
+    assert father.set_parameters(2.) is par
+    assert np.array_equal(par, [2., 4.])
+
+
+def test_variable_views():
+    father, owner, user, _ = create_father()
+    x = father.get_variables(owner, 'x')
+    assert np.array_equal(x, [[1.], [2.]])
+    assert not x.flags.writeable
+    # views are memoized until the solution changes
+    assert father.get_variables(owner, 'x') is x
+    father.set_variables(np.array([[3.], [4.]]), owner, 'x')
+    # views handed out before keep their values
+    assert np.array_equal(x, [[1.], [2.]])
+    assert np.array_equal(father.get_variables(owner, 'x'),
+                          [[3.], [4.]])
+    # the flat vector is read-only as well
+    var = father.get_variables()
+    assert not var.flags.writeable
+    father.set_variables([5., 6.])
+    assert np.array_equal(father.get_variables(owner, 'x'),
+                          [[5.], [6.]])
+    assert np.array_equal(var, [3., 4.])
+
+
+def test_substitution():
+    # the symbols of user are replaced by the variables and parameters of
+    # owner, so the constraints and objective only depend on the structs
+    father, owner, user, problem = create_father()
+    variables, parameters, constraints, objective = problem
+    fun = Function('f', [variables, parameters], [constraints.cat, objective])
+    con, obj = fun([1., 2.], [0.5, 3.])
+    assert np.allclose(np.array(con).ravel(), [0.5, 2.])
+    assert np.allclose(float(obj), 4.)
+
+
+def test_translate_symbols():
+    father, owner, user, _ = create_father()
+    for sym in user._symbols.values():
+        assert father.symbol_dict[sym.name()][0] is owner
+    # symbols should be defined exactly once as variable or parameter
+    other = Child('other')
+    other.define_symbol('y')
+    father = OptiFather([owner, other])
+    father.compose_dictionary()
+    try:
+        father.translate_symbols()
+        assert False
+    except ValueError:
+        pass
+    other = Child('other')
+    other.define_variable('x', 2)
+    father = OptiFather([owner, user, other])
+    father.compose_dictionary()
+    try:
+        father.translate_symbols()
+        assert False
+    except ValueError:
+        pass
@@ -0,0 +1,244 @@
+import numpy as np
+from omgtools import *
+
+
+def create_problem(freeT=True, obstacles=True, options=None):
+    vehicle = Holonomic()
+    vehicle.set_initial_conditions([-1.5, -1.5])
+    vehicle.set_terminal_conditions([2., 2.])
+    environment = Environment(room={'shape': Square(5.)})
+    if obstacles:
+        environment.add_obstacle(Obstacle({'position': [0., 0.]},
+                                          shape=Circle(0.4)))
+    opt = {'verbose': 0}
+    if options is not None:
+        opt.update(options)
+    problem = Point2point(vehicle, environment, opt, freeT=freeT)
+    return problem
+
+
+def update(problem, n_updates):
+    # receding horizon updates, simulating the vehicle in between
+    simulator = Simulator(problem, sample_time=0.01, update_time=0.1)
+    for k in range(n_updates):
+        simulator.update()
+        simulator.update_timing()
+
+
+def test_build_freeT():
+    # T is a variable of the problem and a symbol of the vehicle
+    problem = create_problem(freeT=True)
+    problem.init()
+    problem.solve(0., 0.1)
+    assert problem.telemetry.get_last_record().status == 'Solve_Succeeded'
+
+
+def test_build_fixedT():
+    problem = create_problem(freeT=False)
+    problem.init()
+    problem.solve(0., 0.1)
+    assert problem.telemetry.get_last_record().status == 'Solve_Succeeded'
+
+
+def test_build_report():
+    problem = create_problem()
+    problem.init()
+    report = problem.get_build_report()
+    for phase in ['compose_dictionary', 'translate_symbols', 'structs',
+                  'substitution']:
+        assert phase in report['phases']
+    # every vehicle and obstacle is timed on its own
+    for child in problem.vehicles + problem.environment.obstacles:
+        assert child.label in report['children']
+    assert report['sizes']['nodes_constraints'] > 0
+    assert report['sizes']['nodes_objective'] > 0
+    assert report['total'] > 0.
+
+
+def test_rti(capsys):
+    problem = create_problem(options={'rti': True, 'rti_fallback': False,
+                                      'record_size': 3})
+    problem.init()
+    # the first update solves the full problem, the next ones a single qp
+    update(problem, 3)
+    assert problem.rti_ready
+    assert problem.telemetry.get_status_counts()['RTI_Step'] == 2
+    assert problem.telemetry.get_last_record().status == 'RTI_Step'
+    # the qp keeps the sparsity of the hessian of the lagrangian
+    hess = problem.rti_linearization.sparsity_out(0)
+    assert hess.nnz() < hess.numel()
+    # qp steps are recorded and counted as solutions like full solves
+    assert len(problem.get_recorded_solves()) == 3
+    problem = create_problem(options={'rti': True, 'rti_fallback': False,
+                                      'compute_budget': 1.})
+    problem.init()
+    update(problem, 3)
+    assert problem.fallback_counts['solution'] == 3
+    # a failed step is counted and replaced by a full solve, silently
+    problem = create_problem(options={'rti': True, 'rti_fallback': True})
+    problem.init()
+    update(problem, 1)
+
+    def failing_qp(**kwargs):
+        raise RuntimeError('qp failed')
+    problem.rti_qp = failing_qp
+    capsys.readouterr()
+    update(problem, 1)
+    assert capsys.readouterr()[0] == ''
+    assert problem.telemetry.get_status_counts()['RTI_Failed'] == 1
+    assert problem.telemetry.get_last_record().status == 'Solve_Succeeded'
+
+
+def test_shared_children():
+    # a problem sharing its vehicle with a problem built later, is rebuilt
+    # without compiling its nlp again
+    problem = create_problem()
+    problem.init()
+    other = Point2point(problem.vehicles, Environment(room={'shape': Square(5.)}),
+                        {'verbose': 0}, freeT=True)
+    other.init()
+    nlp = problem.problem
+    problem.father.reset()
+    problem.construct()
+    assert problem.father.check_children()
+    problem.reinitialize()
+    problem.solve(0., 0.1)
+    assert problem.problem is nlp
+    assert problem.telemetry.get_last_record().status == 'Solve_Succeeded'
+
+
+def test_multi_start():
+    problem = create_problem(options={'multi_start': 3,
+                                      'multi_start_jobs': 2})
+    problem.init()
+    problem.solve(0., 0.1)
+    # every forked solve is recorded, the selected one last
+    records = problem.telemetry.get_records()
+    assert 1 <= len(records) <= 3
+    assert records[-1].status == 'Solve_Succeeded'
+    assert all([record.iterations > 0 for record in records])
+
+
+def test_init_spline_candidates(capsys, monkeypatch):
+    problem = create_problem()
+    vehicle, environment = problem.vehicles[0], problem.environment
+    candidates = vehicle.get_init_spline_candidates(environment)
+    assert len(candidates) == 4
+    # silent unless verbose
+    assert capsys.readouterr()[0] == ''
+    # any planner failure falls back to the other guesses
+    from omgtools.problems import globalplanner
+
+    def failing_path(self):
+        raise IndexError('no path')
+    monkeypatch.setattr(globalplanner.AStarPlanner, 'get_path', failing_path)
+    assert len(vehicle.get_init_spline_candidates(environment)) == 3
+    assert capsys.readouterr()[0] == ''
+
+
+def test_dual_warm_start():
+    problem = create_problem(options={'dual_warm_start': True,
+                                      'record_size': 2})
+    problem.init()
+    # the warm start options are not added to the options of the user
+    assert 'ipopt.mu_init' not in problem.options['solver_options']['ipopt']
+    assert problem.problem_warm is not None
+    update(problem, 2)
+    # the first solve starts without and the second one from the
+    # multipliers of the first one
+    first, second = problem.get_recorded_solves()
+    assert not np.any(first['lam_g0'])
+    assert np.any(second['lam_g0'])
+    assert problem.get_solver() is problem.problem_warm
+    assert problem.telemetry.get_last_record().status == 'Solve_Succeeded'
+    # rebuilt without dual warm start, every solve is cold
+    problem.options['dual_warm_start'] = False
+    problem.init()
+    assert problem.problem_warm is None
+
+
+def test_fallback():
+    # the first update is not bounded, the next ones are stopped at once and
+    # fall back on a best feasible iterate or the previous solution
+    problem = create_problem(options={'compute_budget': 1e-6})
+    problem.init()
+    update(problem, 3)
+    counts = problem.fallback_counts
+    assert sum(counts.values()) == 3
+    assert counts['solution'] == 1
+    assert counts['best_feasible'] + counts['previous'] == 2
+    # with a generous budget, every solve succeeds
+    problem = create_problem(options={'compute_budget': 'auto',
+                                      'budget_fraction': 100.})
+    problem.init()
+    update(problem, 3)
+    assert problem.fallback_counts['solution'] == 3
+    # the forked solves of a multi-start share the budget
+    problem = create_problem(options={'compute_budget': 1e-6,
+                                      'multi_start': 2})
+    problem.init()
+    problem.solve(0.5, 0.1)
+    assert problem.fallback_counts['solution'] == 0
+    assert problem.fallback_level in ['best_feasible', 'previous']
+    # vehicles without a braking trajectory can not have a compute budget
+    vehicle = Dubins()
+    vehicle.set_initial_conditions([0., 0., 0.])
+    vehicle.set_terminal_conditions([1., 1., 0.])
+    problem = Point2point(vehicle, Environment(room={'shape': Square(5.)}),
+                          {'verbose': 0, 'compute_budget': 'auto'})
+    try:
+        problem.init()
+        assert False
+    except ValueError:
+        pass
+
+
+def test_solve_batch():
+    problem = create_problem(freeT=False)
+    problem.init()
+    var = problem.father.get_variables().copy()
+    vehicle = problem.vehicles[0]
+    state = vehicle.prediction['state']
+    initial = [[-1.5, -1.5], [-1.5, -1.], [-1., -1.5]]
+    terminal = [[2., 2.], [2., 1.5], [1.5, 2.]]
+    obstacles = [{'position': np.zeros((3, 2))}]
+    result = problem.solve_batch(initial, terminal, obstacles, jobs=2)
+    assert np.all(result['success'])
+    assert result['splines']['splines0'].shape[0] == 3
+    # forked and sequential solves agree
+    serial = problem.solve_batch(initial, terminal, obstacles, jobs=1)
+    assert np.allclose(result['x'], serial['x'])
+    # the problem itself is left untouched
+    assert np.array_equal(problem.father.get_variables(), var)
+    assert np.allclose(vehicle.poseT, [2., 2.])
+    assert vehicle.prediction['state'] is state
+    # the first query is the problem itself
+    problem.solve(0., 0.1)
+    assert np.allclose(result['x'][0], problem.father.get_variables(),
+                       atol=1e-3)
+
+
+def test_tuner(monkeypatch):
+    problem = create_problem(freeT=False, options={'record_size': 3})
+    problem.init()
+    update(problem, 3)
+    assert len(problem.get_recorded_solves()) == 3
+    space = {'mu_strategy': [{'ipopt.mu_strategy': 'adaptive'}]}
+    tuner = SolverTuner(problem, options={'search_space': space,
+                                          'max_rounds': 1, 'verbose': 0})
+    # replaying with the original options reproduces the solves
+    replay = tuner.replay(problem.options['solver_options']['ipopt'])
+    assert np.all(replay['success'])
+    assert tuner.accept(replay, replay)
+    # candidates are created from the build of the problem, not rebuilt
+    from omgtools.basics import optilayer
+    monkeypatch.setattr(optilayer, 'build_nlp', None)
+    result = tuner.tune()
+    assert len(result['history']) == 2
+    assert result['latency'] <= result['reference_latency']
+    # without recorded solves there is nothing to tune
+    try:
+        SolverTuner(create_problem())
+        assert False
+    except ValueError:
+        pass
@@ -0,0 +1,164 @@
+import os
+import numpy as np
+from scipy.interpolate import splev
+from omgtools.basics.spline import BSplineBasis, BSpline, horizon_cache
+from omgtools.basics.spline_extra import shiftfirstknot_T, _shiftfirstknot_T
+from omgtools.basics.spline_extra import evalspline, definite_integral
+from omgtools.basics.spline_extra import shiftoverknot_T, _shiftoverknot_T
+from omgtools.basics.spline_extra import knot_insertion_T, _knot_insertion_T
+from omgtools.basics.spline_extra import shift_knot1_fwd
+from casadi import SX, MX, Function
+from omgtools import *
+
+
+def create_basis(n_int=10, degree=3):
+    knots = np.r_[np.zeros(degree), np.linspace(0., 1., n_int+1),
+                  np.ones(degree)]
+    return BSplineBasis(knots, degree)
+
+
+def test_shiftfirstknot():
+    basis = create_basis()
+    for t_shift in np.random.rand(5)*0.1:
+        T, Tinv = shiftfirstknot_T(basis, t_shift, inverse=True)
+        T_ref, Tinv_ref = _shiftfirstknot_T(basis, t_shift, True)
+        assert np.allclose(T.toarray(), T_ref)
+        assert np.allclose(Tinv.toarray(), Tinv_ref)
+        assert np.allclose(T.dot(Tinv.toarray()), np.eye(len(basis)))
+
+
+def old_transform(basis, other):
+    # transformation by collocation in the maxima of the basis functions
+    b = basis(basis._x).toarray()
+    m = np.argmax(b, axis=0)
+    return np.linalg.solve(b[m, :], other(basis._x[m]).toarray())
+
+
+def test_transform():
+    basis = create_basis()
+    x = np.linspace(0., 1., 101)
+    # bases with a subset of the knots lie in the span of basis
+    others = [create_basis(n_int=5), create_basis(n_int=2)]
+    for other in others:
+        T = basis.transform(other)
+        assert np.allclose(basis(x).dot(T.toarray()), other(x).toarray())
+        assert np.allclose(T.toarray(), old_transform(basis, other))
+    # the transformation is sparse and cached
+    T = basis.transform(others[0])
+    assert T.nnz < T.shape[0]*T.shape[1]
+    assert basis.transform(others[0]) is T
+
+
+def test_product():
+    basis = create_basis(n_int=4, degree=2)
+    s1 = BSpline(basis, np.random.rand(len(basis)))
+    s2 = BSpline(basis, np.random.rand(len(basis)))
+    x = np.linspace(0., 1., 51)
+    assert np.allclose((s1*s2)(x), s1(x)*s2(x))
+
+
+def test_eval_basis():
+    # every basis function agrees with scipy's de Boor evaluation
+    for degree in [1, 2, 3]:
+        knots = np.r_[np.zeros(degree), [0., 0.2, 0.5, 1.], np.ones(degree)]
+        basis = BSplineBasis(knots, degree)
+        x = np.r_[np.linspace(0., 1., 51), 0.2, 0.5]
+        B = basis(x)
+        assert B.shape == (x.size, len(basis))
+        for k in range(len(basis)):
+            coeffs = np.zeros(len(basis))
+            coeffs[k] = 1.
+            ref = splev(x, (basis.knots, coeffs, degree))
+            assert np.allclose(B[:, k].toarray().ravel(), ref)
+        # partition of unity
+        assert np.allclose(B.sum(axis=1), 1.)
+
+
+def test_evalspline():
+    # the symbolic evaluation agrees with the numeric one, on every knot
+    # interval and in the knots themselves
+    basis = create_basis(n_int=5)
+    coeffs = np.random.rand(len(basis))
+    spline = BSpline(basis, coeffs)
+    t = MX.sym('t')
+    fun = Function('f', [t], [evalspline(spline, t)])
+    for x in np.r_[np.linspace(0., 1., 23), 0.2, 0.4]:
+        assert np.isclose(float(fun(x)), basis(np.array([x])).dot(coeffs)[0])
+    # symbolic coefficients
+    c = MX.sym('c', len(basis))
+    fun = Function('f', [c, t], [evalspline(BSpline(basis, c), t)])
+    assert np.isclose(float(fun(coeffs, 0.33)),
+                      basis(np.array([0.33])).dot(coeffs)[0])
+
+
+def test_evalspline_knots():
+    # in every knot, including the boundary ones, the symbolic evaluation
+    # gives BSpline.__call__, also when expanded to SX
+    basis = create_basis(n_int=4, degree=2)
+    spline = BSpline(basis, np.random.rand(len(basis)))
+    knots = np.unique(basis.knots)
+    for sym in [SX, MX]:
+        t = sym.sym('t')
+        fun = Function('f', [t], [evalspline(spline, t)])
+        if sym is MX:
+            fun = fun.expand()
+        for x in knots:
+            assert np.isclose(float(fun(x)), spline(np.array([x]))[0])
+
+
+def test_evalspline_nlp():
+    # the initial conditions of a fixed time problem use evalspline in an
+    # nlp that is expanded
+    vehicle = Holonomic()
+    vehicle.set_initial_conditions([-1.5, -1.5])
+    vehicle.set_terminal_conditions([2., 2.])
+    environment = Environment(room={'shape': Square(5.)})
+    problem = Point2point(vehicle, environment, {'verbose': 0}, freeT=False)
+    problem.init()
+    problem.solve(0., 0.1)
+    assert problem.telemetry.get_last_record().status == 'Solve_Succeeded'
+    splines = problem.father.get_variables(vehicle, 'splines0')
+    assert np.allclose([float(s(np.array([0.]))[0]) for s in splines],
+                       [-1.5, -1.5], atol=1e-6)
+
+
+def test_definite_integral():
+    basis = create_basis(n_int=5)
+    coeffs = np.random.rand(len(basis))
+    spline = BSpline(basis, coeffs)
+    a = MX.sym('a')
+    fun = Function('f', [a], [definite_integral(spline, a, 1.)])
+    for lower in [0., 0.3, 0.6]:
+        x = np.linspace(lower, 1., 2001)
+        assert np.isclose(float(fun(lower)),
+                          np.trapz(basis(x).dot(coeffs), x), atol=1e-5)
+
+
+def test_horizon_cache():
+    basis = create_basis()
+    # transformations are shared by equal bases
+    T = shiftoverknot_T(basis)
+    assert shiftoverknot_T(create_basis()) is T
+    assert np.allclose(T.toarray(), _shiftoverknot_T(basis))
+    T, knots = knot_insertion_T(basis, [0.25])
+    T_ref, knots_ref = _knot_insertion_T(basis, [0.25])
+    assert np.allclose(T.toarray(), T_ref.toarray()) and knots == knots_ref
+    # the shift over t_shift does not fill the cache
+    n_entries = horizon_cache.get_stats()['entries']
+    for t_shift in np.linspace(0.01, 0.05, 5):
+        shiftfirstknot_T(basis, t_shift)
+    assert horizon_cache.get_stats()['entries'] <= n_entries + 1
+    # the symbolic shift is one cached function
+    cfs = MX.sym('cfs', len(basis))
+    shift_knot1_fwd(cfs, basis, 0.01)
+    n_entries = horizon_cache.get_stats()['entries']
+    shift_knot1_fwd(cfs, basis, 0.02)
+    assert horizon_cache.get_stats()['entries'] == n_entries
+
+
+def test_line_endings():
+    # spline.py has CRLF line endings, an editor should not convert them
+    import omgtools.basics.spline as spline
+    with open(os.path.splitext(spline.__file__)[0] + '.py', 'rb') as f:
+        lines = f.read().split(b'\n')[:-1]
+    assert all([line.endswith(b'\r') for line in lines])
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import numpy as np
+from omgtools import *
+
+
+def test_library():
+    library = WarmStartLibrary(size=3)
+    assert library.query([0., 0.]) is None
+    for k in range(4):
+        library.add([k, 10.*k], [k], [0.], [0.])
+    # the oldest solution is dropped
+    assert len(library) == 3
+    entry = library.query([0.9, 9.])
+    assert entry['var'][0] == 1.
+    assert library.query([10., 100.], max_distance=0.5) is None
+    assert (library.n_hits, library.n_misses) == (1, 2)
+    # the solution used last is kept when a new one is added
+    library.add([4., 40.], [4.], [0.], [0.])
+    assert library.query([1., 10.])['var'][0] == 1.
+    try:
+        library.add([0.], [0.], [0.], [0.])
+        assert False
+    except ValueError:
+        pass
+
+
+def test_scale():
+    library = WarmStartLibrary(scale=[1., 10.])
+    library.add([0., 0.], [0.], [0.], [0.])
+    assert np.isclose(library.query([3., 40.])['distance'], 5.)
+    # distances do not depend on the stored solutions
+    library.add([1., 100.], [1.], [0.], [0.])
+    assert np.isclose(library.query([3., 40.])['distance'], 5.)
+    try:
+        WarmStartLibrary(scale=0.)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_save_load():
+    library = WarmStartLibrary()
+    for k in range(3):
+        library.add([k], [k, k], [k], [k, k])
+    filename = os.path.join(tempfile.mkdtemp(), 'library.npz')
+    library.save(filename)
+    loaded = WarmStartLibrary()
+    loaded.load(filename)
+    assert len(loaded) == 3
+    assert np.array_equal(loaded.query([2.])['var'], [2., 2.])
+    os.remove(filename)
+
+
+def test_problem_library():
+    # a cold start of a problem that was solved before, starts from its
+    # stored solution
+    vehicle = Holonomic()
+    vehicle.set_initial_conditions([-1.5, -1.5])
+    vehicle.set_terminal_conditions([2., 2.])
+    environment = Environment(room={'shape': Square(5.)})
+    environment.add_obstacle(Obstacle({'position': [0., 0.]},
+                                      shape=Circle(0.4)))
+    problem = Point2point(vehicle, environment,
+                          {'verbose': 0, 'warm_start_library': 10},
+                          freeT=False)
+    problem.init()
+    problem.solve(0., 0.1)
+    library = problem.warm_start_library
+    assert len(library) == 1 and library.n_misses == 1
+    iterations = problem.telemetry.get_last_record().iterations
+    problem.reset_init_guess()
+    problem.solve(0., 0.1)
+    assert library.n_hits == 1
+    assert problem.telemetry.get_last_record().iterations <= iterations
+    # every successful solve is stored
+    assert len(library) == 2
+    # an initial guess of the user is not replaced
+    init_guess = vehicle.get_init_spline_value()
+    problem.reset_init_guess(init_guess)
+    assert np.allclose(problem.father.get_variables(vehicle, 'splines0',
+                                                    spline=False), init_guess)
+    problem.solve(0., 0.1)
+    assert (library.n_hits, library.n_misses) == (1, 1)